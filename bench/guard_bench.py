@@ -0,0 +1,411 @@
+"""Throughput benchmark for the group guard.
+
+Feeds synthetic group ``Update`` objects — single posts and albums from a
+mix of subscribed, expired, unregistered, DB-admin and group-admin users —
+through the real ``Dispatcher`` as ``main.create_dispatcher`` builds it
+(Postgres FSM storage, event isolation, routers and middlewares).
+Telegram is replaced by a fake bot session and Postgres by an in-memory
+pool answering the statements the guard and FSM paths issue, each with
+optional simulated latency, so the numbers reflect the bot's own overhead.
+
+Settings are still read from .env (any syntactically valid values do, no
+database or Telegram access is made):
+
+    python -m bench.guard_bench --updates 20000 --concurrency 100
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    DeleteMessages,
+    GetChatAdministrators,
+    GetChatMember,
+    GetMe,
+    SendMessage,
+    TelegramMethod,
+)
+from aiogram.types import (
+    Chat,
+    ChatMemberAdministrator,
+    ChatMemberMember,
+    Message,
+    PhotoSize,
+    Update,
+    User,
+)
+
+import main as bot_main
+from config import settings
+from db import queries
+from db.cache import auth_cache
+from handlers import group_guard
+from services.ad_log import ad_log
+from services.cooldown import cooldown
+from services.delete_queue import delete_queue
+from services.duplicates import duplicate_index
+from services.groups import group_registry
+from services.message_expiry import message_expiry
+from services.sender import sender
+
+BOT_ID = 1_000_000
+BOT_TOKEN = f"{BOT_ID}:BENCHMARK"
+
+# Message, album and update IDs stay unique across the warm-up and the run
+_ids = itertools.count(1)
+
+# Share of posters by kind; group admins are known to the roster,
+# DB admins only by their role in the users table
+USER_MIX = {
+    "subscribed": 0.50,
+    "expired": 0.20,
+    "unregistered": 0.15,
+    "db_admin": 0.05,
+    "group_admin": 0.10,
+}
+
+# Unregistered users behind the --spam share of posts (flood-limited)
+SPAMMERS = list(range(90_000, 90_005))
+
+# Ad texts are random picks from these words, so only deliberate reposts
+# look alike to the duplicate index
+AD_WORDS = (
+    "sotiladi ijaraga kvartira uy mashina telefon narxi kelishilgan yangi "
+    "holati zo'r manzil markaz tel xona qavat kredit naqd chegirma"
+).split()
+
+
+# ─────────────────────────── fake Telegram ───────────────────────────
+
+class FakeSession(BaseSession):
+    """Answers the Bot API methods the guard path calls, after ``latency`` seconds."""
+
+    def __init__(self, latency: float, admin_ids: list[int]):
+        super().__init__()
+        self.latency = latency
+        self.admin_ids = set(admin_ids)
+        self.calls: Counter = Counter()
+        self._message_id = 10_000_000
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, DeleteMessages):
+            return True
+        if isinstance(method, SendMessage):
+            self._message_id += 1
+            return Message(
+                message_id=self._message_id,
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=method.chat_id, type="supergroup"),
+                from_user=User(id=BOT_ID, is_bot=True, first_name="bench"),
+                text=method.text,
+            )
+        if isinstance(method, GetChatAdministrators):
+            return [_admin_member(uid) for uid in self.admin_ids]
+        if isinstance(method, GetMe):
+            return User(id=BOT_ID, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, GetChatMember):
+            if method.user_id in self.admin_ids:
+                return _admin_member(method.user_id)
+            return ChatMemberMember(user=User(id=method.user_id, is_bot=False, first_name="u"))
+        raise NotImplementedError(f"FakeSession does not answer {type(method).__name__}")
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def _admin_member(user_id: int) -> ChatMemberAdministrator:
+    return ChatMemberAdministrator(
+        user=User(id=user_id, is_bot=False, first_name="admin"),
+        can_be_edited=False, is_anonymous=False, can_manage_chat=True,
+        can_delete_messages=True, can_manage_video_chats=True,
+        can_restrict_members=True, can_promote_members=False,
+        can_change_info=True, can_invite_users=True,
+        can_post_stories=False, can_edit_stories=False, can_delete_stories=False,
+    )
+
+
+# ─────────────────────────── fake Postgres ───────────────────────────
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)")
+
+
+class MemoryConnection:
+    """Serves the statements of the guard path from dicts; anything else fails loudly."""
+
+    def __init__(self, pool: "MemoryPool"):
+        self.pool = pool
+
+    async def _wait(self, sql: str):
+        table = _TABLE.search(sql)
+        self.pool.statements[table.group(1) if table else "?"] += 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+
+    async def fetchrow(self, sql: str, *args):
+        await self._wait(sql)
+        if "FROM users WHERE telegram_id = $1" in sql:
+            return self.pool.users.get(args[0])
+        if "FROM fsm_storage" in sql:
+            return None  # no admin flow in progress
+        raise NotImplementedError(sql)
+
+    async def fetch(self, sql: str, *args):
+        await self._wait(sql)
+        if "FROM blackout_periods" in sql:
+            return self.pool.blackouts
+        if "FROM groups" in sql:
+            return self.pool.groups
+        if "FROM group_last_ads" in sql or "FROM ads" in sql or "FROM pending_deletions" in sql:
+            return []
+        raise NotImplementedError(sql)
+
+    async def execute(self, sql: str, *args):
+        await self._wait(sql)
+        if "INSERT INTO groups" in sql:
+            return "INSERT 0 0"  # seeded by MemoryPool already
+        if "INSERT INTO group_last_ads" in sql or "UPDATE users u SET last_ad_at" in sql:
+            return "UPDATE"
+        if "INSERT INTO fsm_storage" in sql:
+            return "INSERT 0 1"
+        raise NotImplementedError(sql)
+
+    async def copy_records_to_table(self, table: str, records, columns):
+        await self._wait(f"INTO {table}")
+        self.pool.copied.extend(dict(zip(columns, r)) for r in records)
+
+
+class MemoryPool:
+    def __init__(self, latency: float):
+        self.latency = latency
+        # telegram_id -> (role, subscription_until), the UserAuth column order
+        self.users: dict[int, tuple] = {}
+        self.blackouts: list[dict] = []
+        # (chat_id, title, cooldown_hours), the Group column order
+        self.groups: list[tuple] = []
+        self.copied: list[dict] = []
+        self.statements: Counter = Counter()  # by table
+
+    def acquire(self):
+        return _Acquire(self)
+
+
+class _Acquire:
+    def __init__(self, pool: MemoryPool):
+        self.pool = pool
+
+    async def __aenter__(self) -> MemoryConnection:
+        return MemoryConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+# ─────────────────────────── workload ───────────────────────────
+
+def _make_users(count: int, pool: MemoryPool, rng: random.Random) -> tuple[list[int], list[int]]:
+    """Register users in the memory pool; return (all poster IDs, group admin IDs)."""
+    now = datetime.now(timezone.utc)
+    posters, group_admins = [], []
+    kinds, weights = zip(*USER_MIX.items())
+    for i in range(count):
+        user_id = 10_000 + i
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "subscribed":
+            pool.users[user_id] = ("client", now + timedelta(days=30))
+        elif kind == "expired":
+            pool.users[user_id] = ("client", now - timedelta(days=1))
+        elif kind == "db_admin":
+            pool.users[user_id] = ("admin", None)
+        elif kind == "group_admin":
+            group_admins.append(user_id)
+        posters.append(user_id)
+    return posters, group_admins
+
+
+def _make_updates(
+    count: int,
+    posters: list[int],
+    group_ids: list[int],
+    album_share: float,
+    repost_share: float,
+    spam_share: float,
+    rng: random.Random,
+) -> list[Update]:
+    updates: list[Update] = []
+    texts: list[str] = []
+    chats = [Chat(id=chat_id, type="supergroup", title="bench") for chat_id in group_ids]
+    now = datetime.now(timezone.utc)
+    while len(updates) < count:
+        chat = rng.choice(chats)
+        user_id = rng.choice(SPAMMERS) if rng.random() < spam_share else rng.choice(posters)
+        user = User(id=user_id, is_bot=False, first_name="Bench", last_name="User")
+        if rng.random() < album_share:
+            parts = rng.randint(2, 5)
+            media_group_id = f"bench-{next(_ids)}"
+        else:
+            parts, media_group_id = 1, None
+
+        for part in range(parts):
+            message_id = next(_ids)
+            fields = dict(message_id=message_id, date=now, chat=chat, from_user=user)
+            if media_group_id:
+                fields.update(
+                    media_group_id=media_group_id,
+                    photo=[PhotoSize(
+                        file_id=f"p{message_id}", file_unique_id=f"u{message_id}",
+                        width=1280, height=960,
+                    )],
+                    caption="Sotiladi, narxi kelishilgan" if part == 0 else None,
+                )
+            else:
+                if texts and rng.random() < repost_share:
+                    fields["text"] = rng.choice(texts)
+                else:
+                    fields["text"] = " ".join(rng.choices(AD_WORDS, k=12))
+                    texts.append(fields["text"])
+            updates.append(Update(update_id=message_id, message=Message(**fields)))
+    return updates[:count]
+
+
+async def _feed(dp: Dispatcher, bot: Bot, updates: list[Update], concurrency: int) -> list[float]:
+    """Feed updates like polling does (one task each, ``concurrency`` in flight)."""
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(update: Update):
+        async with semaphore:
+            start = time.perf_counter()
+            await dp.feed_update(bot, update)
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    await asyncio.gather(*(one(u) for u in updates))
+    # Albums are decided in background tasks once their window closes
+    while group_guard._album_tasks:
+        await asyncio.gather(*list(group_guard._album_tasks))
+    return samples
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    return sorted_samples[max(0, int(len(sorted_samples) * q) - 1)]
+
+
+async def main(args):
+    # aiogram logs every handled update at INFO; that is terminal I/O, not guard cost
+    if not args.log_updates:
+        logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    pool = MemoryPool(latency=args.db_latency / 1000)
+    posters, group_admins = _make_users(args.users, pool, rng)
+    if args.blackout:
+        now = datetime.now(timezone.utc)
+        pool.blackouts.append({
+            "chat_id": None,
+            "start_datetime": now - timedelta(hours=1),
+            "end_datetime": now + timedelta(hours=1),
+        })
+
+    group_ids = [settings.GROUP_ID - i for i in range(args.groups)]
+    pool.groups = [(chat_id, f"bench {chat_id}", None) for chat_id in group_ids]
+
+    session = FakeSession(latency=args.api_latency / 1000, admin_ids=group_admins)
+    bot = Bot(token=BOT_TOKEN, session=session)
+    settings.ALBUM_BATCH_WINDOW = args.album_window
+    settings.UPDATE_CONCURRENCY = args.update_concurrency
+    settings.UPDATE_ORDER_KEY = args.order_by
+
+    # Same startup as main.main, minus the network
+    await queries.set_pool(pool)
+    await group_registry.load()
+    await queries.reload_blackouts()
+    await cooldown.load()
+    await duplicate_index.load()
+    await message_expiry.load()
+    for chat_id in group_ids:
+        await group_registry.roster(chat_id).refresh(bot)
+
+    dp = bot_main.create_dispatcher(bot)
+
+    # Warnings stay queued in the sender: its per-group rate limit (not the
+    # guard) would dominate the run, and submit() is all the guard pays for
+    workers = [
+        asyncio.create_task(delete_queue.run(bot)),
+        asyncio.create_task(ad_log.run()),
+    ]
+    try:
+        warmup = _make_updates(args.warmup, posters, group_ids, args.albums, args.reposts, args.spam, rng)
+        await _feed(dp, bot, warmup, args.concurrency)
+        if args.cold:
+            auth_cache.clear()
+        pool.copied.clear()
+        pool.statements.clear()
+
+        updates = _make_updates(args.updates, posters, group_ids, args.albums, args.reposts, args.spam, rng)
+        started = time.perf_counter()
+        samples = await _feed(dp, bot, updates, args.concurrency)
+        elapsed = time.perf_counter() - started
+        await ad_log.flush()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await delete_queue.flush(bot)
+
+    samples.sort()
+    posts = Counter(row["reason"] for row in pool.copied)
+    print(
+        f"{len(updates)} updates ({sum(posts.values())} posts), {args.users} users, "
+        f"{args.groups} groups, "
+        f"concurrency {args.concurrency}, db {args.db_latency} ms, api {args.api_latency} ms\n"
+    )
+    print(f"{'throughput':<14}{len(updates) / elapsed:>12.0f} updates/s")
+    print(f"{'p50':<14}{statistics.median(samples):>12.1f} µs")
+    print(f"{'p99':<14}{_percentile(samples, 0.99):>12.1f} µs")
+    print(f"{'max':<14}{samples[-1]:>12.1f} µs\n")
+    print("decisions:  " + ", ".join(f"{k} {v}" for k, v in posts.most_common()))
+    print("api calls:  " + ", ".join(f"{k} {v}" for k, v in session.calls.most_common()))
+    print(f"warnings:   {sum(sender.queue_depth().values())} queued for sending")
+    print("db queries: " + ", ".join(f"{k} {v}" for k, v in pool.statements.most_common()))
+    print(f"auth cache: {auth_cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--warmup", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument(
+        "--update-concurrency", type=int, default=settings.UPDATE_CONCURRENCY,
+        help="dispatcher concurrency limit, 0 for none",
+    )
+    parser.add_argument("--order-by", choices=("chat", "user"), default=settings.UPDATE_ORDER_KEY)
+    parser.add_argument("--albums", type=float, default=0.2, help="share of posts that are albums")
+    parser.add_argument("--spam", type=float, default=0.0, help="share of posts from a few spammers")
+    parser.add_argument("--reposts", type=float, default=0.1, help="share of texts that repeat one")
+    parser.add_argument("--album-window", type=float, default=0.0, help="seconds")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="ms per statement")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="ms per Bot API call")
+    parser.add_argument("--blackout", action="store_true", help="run with an active blackout")
+    parser.add_argument("--cold", action="store_true", help="clear the auth cache after warm-up")
+    parser.add_argument("--log-updates", action="store_true", help="keep aiogram's per-update log")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
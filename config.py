@@ -1,5 +1,12 @@
+import re
+from typing import Literal
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
+# Telegram's allowed characters for a webhook secret_token
+_WEBHOOK_SECRET_RE = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
 
 class Settings(BaseSettings):
     BOT_TOKEN: str
@@ -7,8 +14,115 @@ class Settings(BaseSettings):
     GROUP_ID: int
     DATABASE_URL: str
 
+    # Update delivery: long polling, or a webhook served by aiohttp
+    RUN_MODE: Literal["polling", "webhook"] = "polling"
+    WEBHOOK_BASE_URL: str = ""      # public https URL, e.g. https://bot.example.com
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str = ""        # checked against X-Telegram-Bot-Api-Secret-Token; required for webhook
+    WEBAPP_HOST: str = "0.0.0.0"
+    WEBAPP_PORT: int = 8080
+
+    # Update processing: at most UPDATE_CONCURRENCY updates run at once;
+    # updates of one user in one chat ("user") or of a whole chat ("chat")
+    # run in arrival order. 0 = aiogram's default of one unbounded task per
+    # update
+    UPDATE_CONCURRENCY: int = 64
+    UPDATE_ORDER_KEY: Literal["chat", "user"] = "user"
+
+    # FSM storage (Postgres): abandoned admin flows expire after FSM_STATE_TTL
+    FSM_STATE_TTL: int = 86_400  # seconds
+    FSM_CLEANUP_INTERVAL: int = 3600  # seconds
+    FSM_CACHE_TTL: float = 1.0  # seconds; 0 disables the local read cache
+
+    # Group guard user-authorization cache
+    AUTH_CACHE_SIZE: int = 10_000
+    AUTH_CACHE_TTL: int = 300  # seconds
+    PROFILE_CACHE_TTL: int = 30  # seconds; full profiles for private/admin handlers
+
+    # Admin user-list page keyboards are memoized this long (seconds)
+    ADMIN_PAGE_CACHE_TTL: int = 60
+
+    # How often the group admin roster is re-read from Telegram
+    ADMIN_ROSTER_REFRESH: int = 600  # seconds
+
+    # Groups added or removed on other workers are picked up this often
+    GROUPS_RELOAD_INTERVAL: int = 60  # seconds
+
+    # Blackouts added by other workers are picked up this often
+    BLACKOUT_RELOAD_INTERVAL: int = 60  # seconds
+
+    # How long the guard waits for the rest of an album before checking it
+    ALBUM_BATCH_WINDOW: float = 1.0  # seconds
+
+    # Flood limit: a user's posts in a group beyond FLOOD_LIMIT per
+    # FLOOD_WINDOW seconds are deleted without any check or warning;
+    # FLOOD_RESTRICT_MINUTES > 0 also mutes the user that long. 0 disables
+    FLOOD_LIMIT: int = 5
+    FLOOD_WINDOW: float = 10.0  # seconds
+    FLOOD_RESTRICT_MINUTES: int = 0
+    FLOOD_TRACKED_USERS: int = 10_000
+
+    # Unauthorized posts are bulk-deleted at least this often
+    DELETE_FLUSH_INTERVAL: float = 0.5  # seconds
+
+    # Guard warnings are deleted from the group after WARNING_TTL (0 keeps
+    # them); the deletion schedule is saved this often to survive restarts
+    WARNING_TTL: int = 300  # seconds
+    WARNING_PERSIST_INTERVAL: float = 5.0  # seconds
+
+    # Subscription expiry reminders: N days before, plus once just after expiry
+    REMINDER_DAYS: list[int] = [3, 1]
+    REMINDER_CHECK_INTERVAL: int = 300  # seconds
+    REMINDER_EXPIRED_GRACE: int = 86_400  # only remind if expired within this many seconds
+
+    # Minimum gap between one client's posts; last_ad_at is persisted in bulk
+    # and posts allowed by other workers are read back at the same interval
+    COOLDOWN_HOURS: float = 4
+    LAST_AD_FLUSH_INTERVAL: float = 30.0  # seconds
+
+    # Duplicate ads: allowed posts are fingerprinted (text SimHash + media
+    # file_unique_id); a repeat in the same group within the window is
+    # rejected, or only flagged in the ad log. 0 hours disables the check
+    DUPLICATE_WINDOW_HOURS: float = 72
+    DUPLICATE_ACTION: Literal["reject", "flag"] = "reject"
+    DUPLICATE_MAX_DISTANCE: int = 3  # SimHash bits that may differ (at most 3)
+
+    # Group posts are logged to the ads table in batches
+    AD_LOG_FLUSH_INTERVAL: float = 5.0  # seconds
+    AD_LOG_BATCH_SIZE: int = 500
+    AD_LOG_MAX_PENDING: int = 50_000
+
+    # Outbound message rate limits (Telegram: ~30/s overall, ~20/min per group)
+    SEND_GLOBAL_RATE: float = 25  # messages per second
+    SEND_GROUP_RATE_PER_MINUTE: float = 20
+    SEND_PRIVATE_RATE: float = 1  # messages per second per private chat
+
+    # Prometheus metrics on their own unauthenticated listener (both modes),
+    # local-only by default. METRICS_PORT=0 disables it
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9100
+    METRICS_PATH: str = "/metrics"
+
+    # On SIGINT/SIGTERM, running handlers and queued sends/deletes/DB writes
+    # get this long to finish; keep it below the supervisor's kill timeout
+    SHUTDOWN_TIMEOUT: float = 8.0  # seconds
+
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def _check_webhook(self) -> "Settings":
+        # Authorization trusts from_user.id, so an unauthenticated webhook
+        # would let anyone post forged updates as the superadmin
+        if self.RUN_MODE == "webhook":
+            if not self.WEBHOOK_BASE_URL:
+                raise ValueError("WEBHOOK_BASE_URL is required when RUN_MODE=webhook")
+            if not _WEBHOOK_SECRET_RE.fullmatch(self.WEBHOOK_SECRET):
+                raise ValueError(
+                    "WEBHOOK_SECRET is required when RUN_MODE=webhook "
+                    "(1-256 characters: A-Z, a-z, 0-9, _ and -)"
+                )
+        return self
+
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,82 @@
+from bisect import bisect_right
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+class BlackoutIndex:
+    """In-memory index of blackout periods (of one group).
+
+    Periods are merged into disjoint, sorted intervals (bounds inclusive,
+    like the SQL check), so "is ``now`` blacked out, and until when" is a
+    single bisect over the start times. Rebuilt by ``queries`` whenever a
+    blackout is added or deleted, and periodically by
+    ``services.blackouts.run_reload`` for changes made by other workers.
+    """
+
+    def __init__(self):
+        self._starts: list[datetime] = []
+        self._ends: list[datetime] = []
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def rebuild(self, periods: Iterable[tuple[datetime, datetime]]):
+        starts: list[datetime] = []
+        ends: list[datetime] = []
+        for start, end in sorted(periods):
+            if ends and start <= ends[-1]:
+                # Overlaps (or touches) the previous interval — extend it
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        # Swap both lists at once so readers never see a half-built index
+        self._starts, self._ends = starts, ends
+        self.loaded = True
+
+    def active_until(self, now: datetime) -> Optional[datetime]:
+        """End of the blackout covering ``now``, or None if there is none."""
+        i = bisect_right(self._starts, now) - 1
+        if i >= 0 and now <= self._ends[i]:
+            return self._ends[i]
+        return None
+
+
+class GroupBlackoutIndex:
+    """Blackout indexes per group.
+
+    Blackouts without a group (``chat_id`` NULL) apply everywhere: they
+    make up the shared index, and are merged into each group's own index
+    too, so a lookup is still one dict get plus one bisect.
+    """
+
+    def __init__(self):
+        self._common = BlackoutIndex()
+        self._by_chat: dict[int, BlackoutIndex] = {}
+        self.loaded = False
+
+    def rebuild(self, periods: Iterable[tuple[Optional[int], datetime, datetime]]):
+        common: list[tuple[datetime, datetime]] = []
+        own: dict[int, list[tuple[datetime, datetime]]] = {}
+        for chat_id, start, end in periods:
+            if chat_id is None:
+                common.append((start, end))
+            else:
+                own.setdefault(chat_id, []).append((start, end))
+
+        common_index = BlackoutIndex()
+        common_index.rebuild(common)
+        by_chat = {}
+        for chat_id, chat_periods in own.items():
+            by_chat[chat_id] = index = BlackoutIndex()
+            index.rebuild(common + chat_periods)
+        self._common, self._by_chat = common_index, by_chat
+        self.loaded = True
+
+    def active_until(self, chat_id: int, now: datetime) -> Optional[datetime]:
+        """End of the blackout covering ``now`` in ``chat_id``, or None."""
+        return self._by_chat.get(chat_id, self._common).active_until(now)
+
+
+blackout_index = GroupBlackoutIndex()
@@ -0,0 +1,77 @@
+from typing import Optional
+
+from cachetools import TTLCache
+
+from config import settings
+from db.records import UserAuth
+
+
+# Returned by AuthCache.get when the user is not cached at all
+# (as opposed to a cached None, which means "not registered").
+MISSING = object()
+
+
+class AuthCache:
+    """Process-local, bounded TTL cache of user rows by telegram_id.
+
+    ``auth_cache`` holds the authorization state, populated lazily by
+    ``queries.get_user_auth`` and kept correct by the write-through hooks
+    in ``queries`` (create_user, extend_subscription, remove_subscription,
+    set_role). The TTL only bounds staleness from writes made outside this
+    process.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Bumped by every write-through so a lazy fill that raced with a
+        # write can't put the stale row back into the cache. Also serves as
+        # the users data version for memoized admin list keyboards.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, telegram_id: int):
+        value = self._cache.get(telegram_id, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def fill(self, telegram_id: int, auth: Optional[UserAuth], generation: int):
+        """Store a value read from the DB, unless a write happened meanwhile."""
+        if generation == self._generation:
+            self._cache[telegram_id] = auth
+
+    def put(self, telegram_id: int, auth: Optional[UserAuth]):
+        """Write-through: store the state a DB write just produced."""
+        self._generation += 1
+        self._cache[telegram_id] = auth
+
+    def invalidate(self, telegram_id: int):
+        self._generation += 1
+        self._cache.pop(telegram_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+auth_cache = AuthCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+# Same mechanics for full UserProfile rows (queries.get_user): the acting
+# user of every private update and admin lookups of target users. Kept
+# short-lived since profiles also change through bulk last_ad_at writes.
+profile_cache = AuthCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.PROFILE_CACHE_TTL)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from cachetools import TTLCache
+
+from db import queries
+
+logger = logging.getLogger(__name__)
+
+
+class PgStorage(BaseStorage):
+    """aiogram FSM storage kept in the ``fsm_storage`` table.
+
+    Survives restarts and is shared by every bot worker using the same
+    database. Writes are upserts; reads go through a small TTL cache, which
+    only needs to outlive one update's worth of get_state/get_data calls —
+    keep ``cache_ttl`` short (or 0) when several workers serve one chat.
+
+    Every admin flow runs in a private chat, so only private keys (chat ==
+    user) are stored. aiogram reads the state of every update, group posts
+    included; for group keys that read is answered without a query.
+    """
+
+    def __init__(self, state_ttl: float, cache_ttl: float = 1.0, cache_size: int = 1024):
+        self.state_ttl = state_ttl
+        self._key_builder = DefaultKeyBuilder(
+            with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._cache: Optional[TTLCache] = (
+            TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_ttl > 0 else None
+        )
+
+    async def _load(self, key: str) -> tuple[Optional[str], dict]:
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        row = await queries.get_fsm_record(key)
+        record = (row["state"], json.loads(row["data"])) if row else (None, {})
+        self._remember(key, *record)
+        return record
+
+    @staticmethod
+    def _stored(key: StorageKey) -> bool:
+        return key.chat_id == key.user_id
+
+    def _remember(self, key: str, state: Optional[str], data: dict):
+        if self._cache is not None:
+            self._cache[key] = (state, data)
+
+    def _cached(self, key: str) -> Optional[tuple[Optional[str], dict]]:
+        return self._cache.get(key) if self._cache is not None else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if not self._stored(key):
+            return
+        db_key = self._key_builder.build(key)
+        state = state.state if isinstance(state, State) else state
+        await queries.set_fsm_state(db_key, state)
+        cached = self._cached(db_key)
+        if cached is not None:
+            self._remember(db_key, state, cached[1])
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        if not self._stored(key):
+            return None
+        state, _ = await self._load(self._key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        if not self._stored(key):
+            return
+        db_key = self._key_builder.build(key)
+        await queries.set_fsm_data(db_key, data)
+        cached = self._cached(db_key)
+        if cached is not None:
+            self._remember(db_key, cached[0], data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        if not self._stored(key):
+            return {}
+        _, data = await self._load(self._key_builder.build(key))
+        return data.copy()
+
+    async def purge_stale(self) -> int:
+        older_than = datetime.now(timezone.utc) - timedelta(seconds=self.state_ttl)
+        return await queries.delete_stale_fsm(older_than)
+
+    async def run_cleanup(self, interval: float):
+        """Expire abandoned states forever; meant to run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.purge_stale()
+                if removed:
+                    logger.info("Removed %d stale FSM records.", removed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("FSM cleanup failed")
+
+    async def close(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
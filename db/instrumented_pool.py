@@ -0,0 +1,81 @@
+import sys
+import time
+
+import asyncpg
+
+from services.metrics import pool_wait, query_latency
+
+
+class _TimedConnection:
+    """Connection proxy timing each statement under the calling function's name."""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+
+    async def _timed(self, query_name: str, call):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            query_latency.observe(time.perf_counter() - start, query_name)
+
+    # sys._getframe(1) is the queries.* function issuing the statement —
+    # cheaper than a decorator on every query and always in sync.
+    def fetch(self, *args, **kwargs):
+        return self._timed(sys._getframe(1).f_code.co_name, self._conn.fetch(*args, **kwargs))
+
+    def fetchrow(self, *args, **kwargs):
+        return self._timed(sys._getframe(1).f_code.co_name, self._conn.fetchrow(*args, **kwargs))
+
+    def fetchval(self, *args, **kwargs):
+        return self._timed(sys._getframe(1).f_code.co_name, self._conn.fetchval(*args, **kwargs))
+
+    def execute(self, *args, **kwargs):
+        return self._timed(sys._getframe(1).f_code.co_name, self._conn.execute(*args, **kwargs))
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(sys._getframe(1).f_code.co_name, self._conn.executemany(*args, **kwargs))
+
+    def copy_records_to_table(self, *args, **kwargs):
+        return self._timed(
+            sys._getframe(1).f_code.co_name, self._conn.copy_records_to_table(*args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _TimedAcquire:
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+        self._conn = None
+
+    async def __aenter__(self) -> _TimedConnection:
+        start = time.perf_counter()
+        self._conn = await self._pool.acquire()
+        pool_wait.observe(time.perf_counter() - start)
+        return _TimedConnection(self._conn)
+
+    async def __aexit__(self, *exc):
+        await self._pool.release(self._conn)
+
+
+class InstrumentedPool:
+    """asyncpg pool wrapper recording pool wait and per-query timings.
+
+    Only ``acquire()`` as an async context manager is instrumented, which
+    is how ``db.queries`` uses the pool; everything else is passed through.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    def acquire(self) -> _TimedAcquire:
+        return _TimedAcquire(self._pool)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
@@ -0,0 +1,157 @@
+import logging
+
+import asyncpg
+
+from db.models import ALL_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Serializes migration runs when several bot instances start at once
+_MIGRATION_LOCK_ID = 0x61647362  # "adsb"
+
+CREATE_SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+"""
+
+# Ordered (version, name, statements). Never edit an applied migration —
+# append a new one instead.
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (1, "initial tables", ALL_TABLES),
+    (2, "hot-path indexes", [
+        # Active-subscription filters in the admin lists
+        """
+        CREATE INDEX IF NOT EXISTS users_subscription_until_idx
+            ON users (subscription_until)
+            WHERE subscription_until IS NOT NULL
+        """,
+        "CREATE INDEX IF NOT EXISTS users_role_idx ON users (role)",
+        "CREATE INDEX IF NOT EXISTS ads_user_id_created_at_idx ON ads (user_id, created_at)",
+        # "Which blackout covers now" fallback query
+        """
+        CREATE INDEX IF NOT EXISTS blackout_periods_range_idx
+            ON blackout_periods USING gist (tstzrange(start_datetime, end_datetime, '[]'))
+        """,
+        # Loading current/future blackouts into the in-memory index
+        """
+        CREATE INDEX IF NOT EXISTS blackout_periods_end_idx
+            ON blackout_periods (end_datetime)
+        """,
+    ]),
+    (3, "fsm storage", [
+        """
+        CREATE TABLE IF NOT EXISTS fsm_storage (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data JSONB NOT NULL DEFAULT '{}'::jsonb,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS fsm_storage_updated_at_idx ON fsm_storage (updated_at)",
+    ]),
+    (4, "subscription reminders", [
+        """
+        CREATE TABLE IF NOT EXISTS subscription_reminders (
+            telegram_id BIGINT NOT NULL,
+            subscription_until TIMESTAMP WITH TIME ZONE NOT NULL,
+            kind VARCHAR(16) NOT NULL,
+            sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            PRIMARY KEY (telegram_id, subscription_until, kind)
+        )
+        """,
+    ]),
+    (5, "ad log columns", [
+        # Rejected posts from unregistered users are logged too
+        "ALTER TABLE ads DROP CONSTRAINT IF EXISTS ads_user_id_fkey",
+        "ALTER TABLE ads ADD COLUMN IF NOT EXISTS chat_id BIGINT",
+        "ALTER TABLE ads ADD COLUMN IF NOT EXISTS message_ids BIGINT[]",
+        "ALTER TABLE ads ADD COLUMN IF NOT EXISTS reason VARCHAR(20)",
+    ]),
+    (6, "user search index", [
+        # pg_trgm is a trusted extension (PG 13+): the database owner may create it
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        # Expression must match queries._SEARCH_TEXT exactly to be used
+        """
+        CREATE INDEX IF NOT EXISTS users_search_trgm_idx ON users USING gin (
+            (lower(coalesce(full_name, '') || ' ' || coalesce(username, '') || ' '
+                   || coalesce(phone, ''))) gin_trgm_ops
+        )
+        """,
+    ]),
+    (7, "multiple groups", [
+        # Guarded groups; NULL settings fall back to the .env defaults
+        """
+        CREATE TABLE IF NOT EXISTS groups (
+            chat_id BIGINT PRIMARY KEY,
+            title VARCHAR(255),
+            cooldown_hours REAL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+        """,
+        # Per-group posting cooldown (users.last_ad_at stays the latest overall)
+        """
+        CREATE TABLE IF NOT EXISTS group_last_ads (
+            chat_id BIGINT NOT NULL,
+            telegram_id BIGINT NOT NULL,
+            last_ad_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (chat_id, telegram_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS group_last_ads_last_ad_at_idx ON group_last_ads (last_ad_at)",
+        # NULL = the blackout applies to every group
+        "ALTER TABLE blackout_periods ADD COLUMN IF NOT EXISTS chat_id BIGINT",
+    ]),
+    (8, "ad fingerprints", [
+        # Set only for posts that went into the duplicate index
+        "ALTER TABLE ads ADD COLUMN IF NOT EXISTS text_simhash BIGINT",
+        "ALTER TABLE ads ADD COLUMN IF NOT EXISTS media_unique_ids TEXT[]",
+        # Rebuilding the duplicate index at startup
+        """
+        CREATE INDEX IF NOT EXISTS ads_fingerprint_created_at_idx ON ads (created_at)
+            WHERE text_simhash IS NOT NULL OR media_unique_ids IS NOT NULL
+        """,
+    ]),
+    (9, "pending deletions", [
+        # Bot messages (guard warnings) scheduled for deletion
+        """
+        CREATE TABLE IF NOT EXISTS pending_deletions (
+            chat_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            delete_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (chat_id, message_id)
+        )
+        """,
+    ]),
+]
+
+
+async def migrate(pool: asyncpg.Pool) -> int:
+    """Apply pending migrations in order, each in its own transaction.
+
+    Returns the resulting schema version.
+    """
+    async with pool.acquire() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", _MIGRATION_LOCK_ID)
+        try:
+            await conn.execute(CREATE_SCHEMA_VERSION_TABLE)
+            current = await conn.fetchval(
+                "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+            )
+            for version, name, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                async with conn.transaction():
+                    for sql in statements:
+                        await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        version, name,
+                    )
+                current = version
+                logger.info("Applied migration %d: %s", version, name)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _MIGRATION_LOCK_ID)
+    return current
@@ -4,6 +4,10 @@ from typing import Optional
 
 import asyncpg
 
+from db.blackouts import blackout_index
+from db.cache import MISSING, auth_cache, profile_cache
+from db.records import Blackout, ExpiringSubscription, Group, UserAuth, UserListItem, UserProfile
+
 
 # ─────────────────────────── pool helper ────────────────────────────
 
@@ -19,13 +23,51 @@ async def set_pool(pool: asyncpg.Pool):
     _pool = pool
 
 
+# Column lists come from db.records, so each query always sends the same
+# SQL text — asyncpg prepares it once per connection and then serves it
+# from its statement cache.
+
 # ─────────────────────────── users ──────────────────────────────────
 
-async def get_user(telegram_id: int) -> Optional[asyncpg.Record]:
+async def get_user(telegram_id: int) -> Optional[UserProfile]:
+    """Full profile, served from the short-lived profile cache."""
+    cached = profile_cache.get(telegram_id)
+    if cached is not MISSING:
+        return cached
+
+    generation = profile_cache.generation
     async with _pool.acquire() as conn:
-        return await conn.fetchrow(
-            "SELECT * FROM users WHERE telegram_id = $1", telegram_id
+        row = await conn.fetchrow(
+            f"SELECT {UserProfile.COLUMNS} FROM users WHERE telegram_id = $1", telegram_id
+        )
+    user = UserProfile.from_record(row)
+    profile_cache.fill(telegram_id, user, generation)
+    return user
+
+
+def _write_through(telegram_id: int, user: Optional[UserProfile]):
+    """Refresh both user caches from the row a write just returned."""
+    profile_cache.put(telegram_id, user)
+    auth_cache.put(telegram_id, UserAuth(user.role, user.subscription_until) if user else None)
+
+
+async def get_user_auth(telegram_id: int) -> Optional[UserAuth]:
+    """Role + subscription_until for the group guard, served from the auth cache.
+
+    Returns None for unregistered users (also cached).
+    """
+    cached = auth_cache.get(telegram_id)
+    if cached is not MISSING:
+        return cached
+
+    generation = auth_cache.generation
+    async with _pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"SELECT {UserAuth.COLUMNS} FROM users WHERE telegram_id = $1", telegram_id
         )
+    auth = UserAuth.from_record(row)
+    auth_cache.fill(telegram_id, auth, generation)
+    return auth
 
 
 async def create_user(
@@ -38,21 +80,24 @@ async def create_user(
     language_code: Optional[str],
     is_bot: bool,
     role: str = "client",
-) -> asyncpg.Record:
+) -> UserProfile:
     async with _pool.acquire() as conn:
-        return await conn.fetchrow(
-            """
+        row = await conn.fetchrow(
+            f"""
             INSERT INTO users
                 (telegram_id, phone, username, first_name, last_name,
                  full_name, language_code, is_bot, role)
             VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)
             ON CONFLICT (telegram_id) DO UPDATE
                 SET phone = EXCLUDED.phone
-            RETURNING *
+            RETURNING {UserProfile.COLUMNS}
             """,
             telegram_id, phone, username, first_name, last_name,
             full_name, language_code, is_bot, role,
         )
+    user = UserProfile.from_record(row)
+    _write_through(telegram_id, user)
+    return user
 
 
 async def update_last_ad(telegram_id: int, dt: datetime):
@@ -60,47 +105,236 @@ async def update_last_ad(telegram_id: int, dt: datetime):
         await conn.execute(
             "UPDATE users SET last_ad_at = $1 WHERE telegram_id = $2", dt, telegram_id
         )
+    profile_cache.invalidate(telegram_id)
 
 
-async def extend_subscription(telegram_id: int, until: datetime):
+async def update_last_ads(telegram_ids: list[int], times: list[datetime]):
+    """Bulk version of update_last_ad: one UPDATE for many users."""
     async with _pool.acquire() as conn:
         await conn.execute(
             """
+            UPDATE users u SET last_ad_at = v.last_ad_at
+            FROM unnest($1::bigint[], $2::timestamptz[]) AS v(telegram_id, last_ad_at)
+            WHERE u.telegram_id = v.telegram_id
+            """,
+            telegram_ids, times,
+        )
+    for telegram_id in telegram_ids:
+        profile_cache.invalidate(telegram_id)
+
+
+async def extend_subscription(telegram_id: int, until: datetime):
+    async with _pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
             UPDATE users
             SET subscription_until = $1
             WHERE telegram_id = $2
+            RETURNING {UserProfile.COLUMNS}
             """,
             until, telegram_id,
         )
+    _write_through(telegram_id, UserProfile.from_record(row))
 
 
 async def remove_subscription(telegram_id: int):
     async with _pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE users SET subscription_until = NULL WHERE telegram_id = $1",
+        row = await conn.fetchrow(
+            f"""
+            UPDATE users SET subscription_until = NULL
+            WHERE telegram_id = $1
+            RETURNING {UserProfile.COLUMNS}
+            """,
             telegram_id,
         )
+    _write_through(telegram_id, UserProfile.from_record(row))
 
 
-async def get_all_users() -> list[asyncpg.Record]:
+async def get_all_users() -> list[UserListItem]:
     async with _pool.acquire() as conn:
-        return await conn.fetch(
-            "SELECT * FROM users WHERE role IN ('client', 'admin') ORDER BY created_at DESC"
+        rows = await conn.fetch(
+            f"""
+            SELECT {UserListItem.COLUMNS} FROM users
+            WHERE role IN ('client', 'admin') ORDER BY created_at DESC
+            """
         )
+    return [UserListItem(*r) for r in rows]
+
+
+# Subscription-state filters for the admin user lists ($1 = now)
+_SUBSCRIPTION_FILTERS = {
+    True: "subscription_until > $1",
+    False: "(subscription_until IS NULL OR subscription_until < $1)",
+}
+
+async def get_users_page(
+    active: bool,
+    now: datetime,
+    limit: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> list[UserListItem]:
+    """One page of clients/admins filtered by subscription state, newest first.
+
+    Keyset pagination on users.id: ``after_id`` fetches the page following a
+    row, ``before_id`` the page preceding it, neither the first page.
+    """
+    where = f"role IN ('client', 'admin') AND {_SUBSCRIPTION_FILTERS[active]}"
+    async with _pool.acquire() as conn:
+        if before_id is not None:
+            rows = await conn.fetch(
+                f"""
+                SELECT {UserListItem.COLUMNS} FROM users
+                WHERE {where} AND id > $2
+                ORDER BY id ASC LIMIT $3
+                """,
+                now, before_id, limit,
+            )
+            rows.reverse()
+        elif after_id is not None:
+            rows = await conn.fetch(
+                f"""
+                SELECT {UserListItem.COLUMNS} FROM users
+                WHERE {where} AND id < $2
+                ORDER BY id DESC LIMIT $3
+                """,
+                now, after_id, limit,
+            )
+        else:
+            rows = await conn.fetch(
+                f"""
+                SELECT {UserListItem.COLUMNS} FROM users
+                WHERE {where}
+                ORDER BY id DESC LIMIT $2
+                """,
+                now, limit,
+            )
+    return [UserListItem(*r) for r in rows]
+
+
+async def count_users(active: bool, now: datetime) -> int:
+    async with _pool.acquire() as conn:
+        return await conn.fetchval(
+            f"""
+            SELECT count(*) FROM users
+            WHERE role IN ('client', 'admin') AND {_SUBSCRIPTION_FILTERS[active]}
+            """,
+            now,
+        )
+
 
+# Indexed by users_search_trgm_idx (migration 6) — keep the two identical
+_SEARCH_TEXT = (
+    "lower(coalesce(full_name, '') || ' ' || coalesce(username, '') || ' '"
+    " || coalesce(phone, ''))"
+)
+
+
+async def search_users(term: str, limit: int) -> list[UserListItem]:
+    """Users whose name, username or phone contains ``term``, or whose
+    telegram_id equals it; newest first, at most ``limit``.
+    """
+    term = term.strip().lstrip("@").lower()
+    telegram_id = int(term) if term.isdigit() and len(term) <= 18 else None  # fits BIGINT
+    # Phone numbers are stored without separators, with or without the "+"
+    # depending on the client; the digits alone match either way
+    digits = term.replace("+", "").replace(" ", "").replace("-", "")
+    if digits.isdigit():
+        term = digits
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT {UserListItem.COLUMNS} FROM users
+            WHERE telegram_id = $2 OR {_SEARCH_TEXT} LIKE $1
+            ORDER BY id DESC LIMIT $3
+            """,
+            pattern, telegram_id, limit,
+        )
+    return [UserListItem(*r) for r in rows]
 
-async def get_user_by_id(user_id: int) -> Optional[asyncpg.Record]:
+
+async def get_user_by_id(user_id: int) -> Optional[UserProfile]:
     """Get user by DB telegram_id (same as telegram_id in our schema)."""
     return await get_user(user_id)
 
 
 async def set_role(telegram_id: int, role: str):
     async with _pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE users SET role = $1 WHERE telegram_id = $2", role, telegram_id
+        row = await conn.fetchrow(
+            f"""
+            UPDATE users SET role = $1
+            WHERE telegram_id = $2
+            RETURNING {UserProfile.COLUMNS}
+            """,
+            role, telegram_id,
         )
+    _write_through(telegram_id, UserProfile.from_record(row))
 
 
+# ─────────────────────────── expiry reminders ───────────────────────
+
+async def get_expiring_subscriptions(
+    now: datetime,
+    kinds: list[str],
+    leads: list[float],
+    expired_grace: float,
+) -> list[ExpiringSubscription]:
+    """Clients whose subscription_until falls in a reminder window.
+
+    Window ``kinds[i]`` covers (now, now + leads[i]] seconds; a lead of 0 is
+    the "just expired" window (now - expired_grace, now]. Each client is
+    reported once, for the narrowest window they're in, with ``reminded``
+    telling whether that reminder was already recorded.
+    """
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH due AS (
+                SELECT DISTINCT ON (u.telegram_id)
+                       u.telegram_id, u.full_name, u.role, u.subscription_until, w.kind
+                FROM users u
+                JOIN unnest($2::text[], $3::float8[]) AS w(kind, lead_secs)
+                  ON u.subscription_until <= $1::timestamptz + make_interval(secs => w.lead_secs)
+                 AND u.subscription_until > $1::timestamptz - make_interval(
+                         secs => CASE WHEN w.lead_secs = 0 THEN $4::float8 ELSE 0 END)
+                WHERE u.role = 'client' AND u.subscription_until IS NOT NULL
+                ORDER BY u.telegram_id, w.lead_secs
+            )
+            SELECT d.telegram_id, d.full_name, d.role, d.subscription_until, d.kind,
+                   EXISTS (
+                       SELECT 1 FROM subscription_reminders r
+                       WHERE r.telegram_id = d.telegram_id
+                         AND r.subscription_until = d.subscription_until
+                         AND r.kind = d.kind
+                   ) AS reminded
+            FROM due d
+            """,
+            now, kinds, leads, expired_grace,
+        )
+    return [ExpiringSubscription(*r) for r in rows]
+
+
+async def claim_reminders(reminders: list[tuple[int, datetime, str]]) -> set[tuple[int, str]]:
+    """Record (telegram_id, subscription_until, kind) reminders as sent.
+
+    Returns the (telegram_id, kind) pairs this call recorded; those another
+    worker recorded first are left out, so each reminder is sent once.
+    """
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            INSERT INTO subscription_reminders (telegram_id, subscription_until, kind)
+            SELECT * FROM unnest($1::bigint[], $2::timestamptz[], $3::text[])
+            ON CONFLICT DO NOTHING
+            RETURNING telegram_id, kind
+            """,
+            [telegram_id for telegram_id, _, _ in reminders],
+            [until for _, until, _ in reminders],
+            [kind for _, _, kind in reminders],
+        )
+    return {(r["telegram_id"], r["kind"]) for r in rows}
+
 # ─────────────────────────── ads ────────────────────────────────────
 
 async def create_ad(
@@ -119,6 +353,34 @@ async def create_ad(
         )
 
 
+async def insert_ads(records: list[tuple], columns: tuple[str, ...]):
+    """Bulk-insert ad log rows with a single COPY."""
+    async with _pool.acquire() as conn:
+        await conn.copy_records_to_table("ads", records=records, columns=columns)
+
+
+async def get_recent_ad_fingerprints(
+    since: datetime,
+) -> list[tuple[int, int, Optional[int], Optional[list[str]], datetime]]:
+    """(chat_id, user_id, text_simhash, media_unique_ids, created_at) of
+    fingerprinted posts newer than ``since``, oldest first."""
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT chat_id, user_id, text_simhash, media_unique_ids, created_at
+            FROM ads
+            WHERE created_at > $1
+              AND (text_simhash IS NOT NULL OR media_unique_ids IS NOT NULL)
+            ORDER BY created_at
+            """,
+            since,
+        )
+    return [
+        (r["chat_id"], r["user_id"], r["text_simhash"], r["media_unique_ids"], r["created_at"])
+        for r in rows
+    ]
+
+
 async def mark_ad_sent(ad_id: int, sent_at: datetime):
     async with _pool.acquire() as conn:
         await conn.execute(
@@ -128,39 +390,237 @@ async def mark_ad_sent(ad_id: int, sent_at: datetime):
 
 # ─────────────────────────── blackout ───────────────────────────────
 
-async def add_blackout(start: datetime, end: datetime, created_by: int) -> asyncpg.Record:
+async def add_blackout(
+    start: datetime, end: datetime, created_by: int, chat_id: Optional[int] = None
+) -> Blackout:
+    """``chat_id`` None blacks out every group."""
     async with _pool.acquire() as conn:
-        return await conn.fetchrow(
-            """
-            INSERT INTO blackout_periods (start_datetime, end_datetime, created_by)
-            VALUES ($1, $2, $3)
-            RETURNING *
+        row = await conn.fetchrow(
+            f"""
+            INSERT INTO blackout_periods (start_datetime, end_datetime, created_by, chat_id)
+            VALUES ($1, $2, $3, $4)
+            RETURNING {Blackout.COLUMNS}
             """,
-            start, end, created_by,
+            start, end, created_by, chat_id,
         )
+    await reload_blackouts()
+    return Blackout.from_record(row)
 
 
-async def get_active_blackout(now: datetime) -> Optional[asyncpg.Record]:
+async def reload_blackouts():
+    """Rebuild the in-memory blackout index from current and future periods."""
     async with _pool.acquire() as conn:
-        return await conn.fetchrow(
+        rows = await conn.fetch(
             """
-            SELECT * FROM blackout_periods
-            WHERE start_datetime <= $1 AND end_datetime >= $1
+            SELECT chat_id, start_datetime, end_datetime FROM blackout_periods
+            WHERE end_datetime >= $1
+            """,
+            datetime.now(timezone.utc),
+        )
+    blackout_index.rebuild(
+        (r["chat_id"], r["start_datetime"], r["end_datetime"]) for r in rows
+    )
+
+
+async def get_active_blackout(now: datetime, chat_id: int) -> Optional[Blackout]:
+    async with _pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
+            SELECT {Blackout.COLUMNS} FROM blackout_periods
+            WHERE tstzrange(start_datetime, end_datetime, '[]') @> $1::timestamptz
+              AND (chat_id IS NULL OR chat_id = $2)
+            ORDER BY end_datetime DESC
             LIMIT 1
             """,
-            now,
+            now, chat_id,
         )
+    return Blackout.from_record(row)
+
 
+async def get_blackout_end(now: datetime, chat_id: int) -> Optional[datetime]:
+    """When the blackout covering ``now`` in ``chat_id`` ends, or None if
+    posting is allowed.
 
-async def get_all_blackouts() -> list[asyncpg.Record]:
+    Answered from the in-memory index; the DB is only queried until the
+    index has been loaded.
+    """
+    if blackout_index.loaded:
+        return blackout_index.active_until(chat_id, now)
+    blackout = await get_active_blackout(now, chat_id)
+    return blackout.end_datetime if blackout else None
+
+
+async def get_all_blackouts() -> list[Blackout]:
     async with _pool.acquire() as conn:
-        return await conn.fetch(
-            "SELECT * FROM blackout_periods ORDER BY start_datetime DESC LIMIT 20"
+        rows = await conn.fetch(
+            f"SELECT {Blackout.COLUMNS} FROM blackout_periods ORDER BY start_datetime DESC LIMIT 20"
         )
+    return [Blackout(*r) for r in rows]
 
 
 async def delete_blackout(blackout_id: int):
     async with _pool.acquire() as conn:
         await conn.execute(
             "DELETE FROM blackout_periods WHERE id = $1", blackout_id
-        )
\ No newline at end of file
+        )
+    await reload_blackouts()
+
+
+# ─────────────────────────── groups ─────────────────────────────────
+
+async def get_groups() -> list[Group]:
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(f"SELECT {Group.COLUMNS} FROM groups ORDER BY created_at")
+    return [Group(*r) for r in rows]
+
+
+async def seed_group(chat_id: int) -> bool:
+    """Register ``chat_id`` if it isn't yet; True if it was just added."""
+    async with _pool.acquire() as conn:
+        status = await conn.execute(
+            "INSERT INTO groups (chat_id) VALUES ($1) ON CONFLICT (chat_id) DO NOTHING",
+            chat_id,
+        )
+    return status == "INSERT 0 1"
+
+
+async def upsert_group(
+    chat_id: int, title: Optional[str], cooldown_hours: Optional[float]
+) -> Group:
+    async with _pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
+            INSERT INTO groups (chat_id, title, cooldown_hours) VALUES ($1, $2, $3)
+            ON CONFLICT (chat_id) DO UPDATE
+                SET title = EXCLUDED.title, cooldown_hours = EXCLUDED.cooldown_hours
+            RETURNING {Group.COLUMNS}
+            """,
+            chat_id, title, cooldown_hours,
+        )
+    return Group.from_record(row)
+
+
+async def delete_group(chat_id: int):
+    async with _pool.acquire() as conn:
+        await conn.execute("DELETE FROM groups WHERE chat_id = $1", chat_id)
+
+
+async def get_recent_group_ad_times(since: datetime) -> list[tuple[int, int, datetime]]:
+    """(chat_id, telegram_id, last_ad_at) of posts newer than ``since``."""
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT chat_id, telegram_id, last_ad_at FROM group_last_ads WHERE last_ad_at > $1",
+            since,
+        )
+    return [(r["chat_id"], r["telegram_id"], r["last_ad_at"]) for r in rows]
+
+
+async def upsert_group_last_ads(
+    chat_ids: list[int], telegram_ids: list[int], times: list[datetime]
+):
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO group_last_ads (chat_id, telegram_id, last_ad_at)
+            SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::timestamptz[])
+            ON CONFLICT (chat_id, telegram_id) DO UPDATE
+                SET last_ad_at = EXCLUDED.last_ad_at
+            """,
+            chat_ids, telegram_ids, times,
+        )
+
+
+async def seed_group_last_ads(chat_id: int, since: datetime):
+    """Carry users.last_ad_at over to ``chat_id`` (the original single group)."""
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO group_last_ads (chat_id, telegram_id, last_ad_at)
+            SELECT $1, telegram_id, last_ad_at FROM users WHERE last_ad_at > $2
+            ON CONFLICT (chat_id, telegram_id) DO NOTHING
+            """,
+            chat_id, since,
+        )
+
+
+# ─────────────────────────── FSM storage ────────────────────────────
+
+async def get_fsm_record(key: str) -> Optional[asyncpg.Record]:
+    async with _pool.acquire() as conn:
+        return await conn.fetchrow(
+            "SELECT state, data FROM fsm_storage WHERE key = $1", key
+        )
+
+
+async def set_fsm_state(key: str, state: Optional[str]):
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO fsm_storage (key, state) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE
+                SET state = EXCLUDED.state, updated_at = NOW()
+            """,
+            key, state,
+        )
+
+
+async def set_fsm_data(key: str, data: dict):
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO fsm_storage (key, data) VALUES ($1, $2::jsonb)
+            ON CONFLICT (key) DO UPDATE
+                SET data = EXCLUDED.data, updated_at = NOW()
+            """,
+            key, json.dumps(data),
+        )
+
+
+async def delete_stale_fsm(older_than: datetime) -> int:
+    """Drop FSM rows not touched since ``older_than`` and cleared (empty) ones."""
+    async with _pool.acquire() as conn:
+        status = await conn.execute(
+            """
+            DELETE FROM fsm_storage
+            WHERE updated_at < $1
+               OR (state IS NULL AND data = '{}'::jsonb)
+            """,
+            older_than,
+        )
+    return int(status.split()[-1])
+
+
+# ─────────────────────────── pending deletions ──────────────────────
+
+async def get_pending_deletions() -> list[tuple[int, int, datetime]]:
+    """(chat_id, message_id, delete_at) of every scheduled deletion."""
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch("SELECT chat_id, message_id, delete_at FROM pending_deletions")
+    return [(r["chat_id"], r["message_id"], r["delete_at"]) for r in rows]
+
+
+async def add_pending_deletions(
+    chat_ids: list[int], message_ids: list[int], delete_ats: list[datetime]
+):
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO pending_deletions (chat_id, message_id, delete_at)
+            SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::timestamptz[])
+            ON CONFLICT (chat_id, message_id) DO UPDATE
+                SET delete_at = EXCLUDED.delete_at
+            """,
+            chat_ids, message_ids, delete_ats,
+        )
+
+
+async def remove_pending_deletions(chat_ids: list[int], message_ids: list[int]):
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            """
+            DELETE FROM pending_deletions p
+            USING unnest($1::bigint[], $2::bigint[]) AS d (chat_id, message_id)
+            WHERE p.chat_id = d.chat_id AND p.message_id = d.message_id
+            """,
+            chat_ids, message_ids,
+        )
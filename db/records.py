@@ -0,0 +1,68 @@
+"""Compact value objects for query results.
+
+Each class lists its columns in ``__slots__``; queries select exactly
+``Cls.COLUMNS`` (same order) and map rows with ``Cls.from_record``. This
+keeps hot paths off ``SELECT *`` (and the unused ``extra_info`` JSONB) and
+avoids holding on to ``asyncpg.Record`` objects.
+"""
+from typing import Optional
+
+import asyncpg
+
+
+class _Row:
+    __slots__ = ()
+    COLUMNS = ""
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.COLUMNS = ", ".join(cls.__slots__)
+
+    @classmethod
+    def from_record(cls, row: Optional[asyncpg.Record]):
+        return cls(*row) if row is not None else None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class UserAuth(_Row):
+    """The only user fields the group guard needs to authorize a post."""
+    __slots__ = ("role", "subscription_until")
+
+
+class UserProfile(_Row):
+    """A full user row, minus ``extra_info``."""
+    __slots__ = (
+        "id", "telegram_id", "phone", "username", "first_name", "last_name",
+        "full_name", "language_code", "is_bot", "role", "subscription_until",
+        "last_ad_at", "created_at",
+    )
+
+
+class UserListItem(_Row):
+    """One button in the paginated admin user lists."""
+    __slots__ = (
+        "id", "telegram_id", "full_name", "username", "phone", "role",
+        "subscription_until",
+    )
+
+
+class Blackout(_Row):
+    """``chat_id`` is None for blackouts that apply to every group."""
+    __slots__ = ("id", "start_datetime", "end_datetime", "created_by", "created_at", "chat_id")
+
+
+class Group(_Row):
+    """A guarded group; None settings fall back to the .env defaults."""
+    __slots__ = ("chat_id", "title", "cooldown_hours")
+
+
+class ExpiringSubscription(_Row):
+    """A client inside one of the expiry-reminder windows (see queries.get_expiring_subscriptions)."""
+    __slots__ = ("telegram_id", "full_name", "role", "subscription_until", "kind", "reminded")
@@ -1,66 +1,119 @@
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 
-from aiogram import Router, F, Bot
-from aiogram.filters import Command
+from aiogram import Router, F
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.filters import Command, CommandObject
 from aiogram.enums import ChatType
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
 from aiogram.fsm.context import FSMContext
+from cachetools import TTLCache
 
 from config import settings
 from db import queries
+from db.cache import auth_cache
 from keyboards.keys import (
+    PAGE_SIZE,
+    parse_page_callback,
     kb_extend_months,
     kb_admin_cancel,
     kb_blackout_list,
+    kb_blackout_groups,
     kb_admin_menu,
     kb_users_list,
     kb_view_users_list,
     kb_remove_sub_list,
+    kb_search_results,
 )
-from states.forms import AdminExtendStates, AdminBlackoutStates
+from services.groups import group_registry
+from services.sender import Priority, sender
+from states.forms import AdminExtendStates, AdminBlackoutStates, AdminSearchStates
 
 router = Router()
 
 ADMIN_ROLES = {"admin", "superadmin"}
 
+# Shorter search terms can't use the trigram index (and match half the table)
+SEARCH_MIN_LENGTH = 3
 
-async def check_admin(source) -> Optional[str]:
-    user_id = source.from_user.id
-    # .env superadmin always has access, even without a DB record
-    if user_id == settings.SUPERADMIN_ID:
-        return "superadmin"
-    user = await queries.get_user(user_id)
-    if user and user["role"] in ADMIN_ROLES:
-        return user["role"]
-    return None
+# Paginated user lists by callback prefix → (active subscriptions?, builder)
+_USER_LISTS = {
+    "ul_p_": (False, kb_users_list),
+    "vul_p_": (True, kb_view_users_list),
+    "rs_p_": (True, kb_remove_sub_list),
+}
+
+# Built page keyboards by (prefix, page callback_data, users data version).
+# Every write-through to the auth cache bumps the version, so a changed
+# subscription or role never serves an old page; the TTL bounds drift from
+# "now" (expiring subscriptions) and from writes made by other processes.
+_page_cache: TTLCache = TTLCache(maxsize=256, ttl=settings.ADMIN_PAGE_CACHE_TTL)
+
+
+async def _users_page(active: bool, data: Optional[str] = None, prefix: str = ""):
+    """One page of the admin user list → (users, page, total, now).
+
+    ``data`` is the page-flip callback_data; None opens the first page.
+    """
+    page, after_id, before_id = parse_page_callback(data, prefix) if data else (0, None, None)
+    now = datetime.now(timezone.utc)
+    users = await queries.get_users_page(
+        active, now, PAGE_SIZE, after_id=after_id, before_id=before_id
+    )
+    if not users and page:
+        # Rows around the cursor are gone — start over from the first page
+        page = 0
+        users = await queries.get_users_page(active, now, PAGE_SIZE)
+    total = await queries.count_users(active, now) if users else 0
+    return users, page, total, now
+
+
+async def _page_markup(prefix: str, data: Optional[str] = None) -> Optional[InlineKeyboardMarkup]:
+    """Keyboard for one page of a user list, or None if the list is empty.
+
+    Memoized in _page_cache, so flipping back and forth costs no queries.
+    """
+    key = (prefix, data, auth_cache.generation)
+    if key in _page_cache:
+        return _page_cache[key]
+
+    active, build = _USER_LISTS[prefix]
+    users, page, total, now = await _users_page(active, data, prefix)
+    markup = build(users, now, page=page, total=total) if users else None
+    _page_cache[key] = markup
+    return markup
 
 
 # ─────────────────────────── Subscriptions ──────────────────────────
 
 @router.message(F.text == "👥 Obunalar", F.chat.type == ChatType.PRIVATE)
-async def cmd_subscriptions(message: Message):
-    if not await check_admin(message):
+async def cmd_subscriptions(message: Message, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         return
 
-    users = await queries.get_all_users()
-    now = datetime.now(timezone.utc)
-    # Filter: only show users with an active subscription
-    active_users = [u for u in users if u["subscription_until"] and u["subscription_until"] > now]
+    # Only users with an active subscription
+    markup = await _page_markup("vul_p_")
 
-    if not active_users:
+    if not markup:
         return await message.answer("📋 Faol obunaga ega foydalanuvchilar topilmadi.")
 
     await message.answer(
         "📋 <b>Mijozlar ro'yxati:</b>\nBatafsil ma'lumot uchun tanlang:",
-        reply_markup=kb_view_users_list(active_users, now),
+        reply_markup=markup,
         parse_mode="HTML"
     )
 
 
 @router.callback_query(F.data.startswith("view_user_"))
-async def view_user_details(callback: CallbackQuery):
-    if not await check_admin(callback):
+async def view_user_details(callback: CallbackQuery, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
@@ -71,20 +124,20 @@ async def view_user_details(callback: CallbackQuery):
         return
 
     now = datetime.now(timezone.utc)
-    sub = user["subscription_until"]
+    sub = user.subscription_until
     status = f"✅ {sub.strftime('%d.%m.%Y %H:%M')} gacha" if sub and sub > now else "❌ obuna yo'q"
-    last_ad = user["last_ad_at"].strftime('%d.%m.%Y %H:%M') if user["last_ad_at"] else "yo'q"
+    last_ad = user.last_ad_at.strftime('%d.%m.%Y %H:%M') if user.last_ad_at else "yo'q"
 
     text = (
         f"👤 <b>Foydalanuvchi ma'lumotlari:</b>\n\n"
-        f"🆔 ID: <code>{user['telegram_id']}</code>\n"
-        f"👤 Ism: {user['full_name'] or '—'}\n"
-        f"📞 Tel: {user['phone'] or '—'}\n"
-        f"🌐 Username: @{user['username'] or '—'}\n"
-        f"👮 Rol: {user['role']}\n"
+        f"🆔 ID: <code>{user.telegram_id}</code>\n"
+        f"👤 Ism: {user.full_name or '—'}\n"
+        f"📞 Tel: {user.phone or '—'}\n"
+        f"🌐 Username: @{user.username or '—'}\n"
+        f"👮 Rol: {user.role}\n"
         f"📅 Obuna: {status}\n"
         f"🚀 Oxirgi reklama: {last_ad}\n"
-        f"🆕 Ro'yxatdan o'tdi: {user['created_at'].strftime('%d.%m.%Y')}"
+        f"🆕 Ro'yxatdan o'tdi: {user.created_at.strftime('%d.%m.%Y')}"
     )
 
     await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb_admin_cancel())
@@ -94,29 +147,26 @@ async def view_user_details(callback: CallbackQuery):
 # ─────────────────────────── Extend ─────────────────────────────────
 
 @router.message(F.text == "➕ Uzaytirish", F.chat.type == ChatType.PRIVATE)
-async def cmd_extend(message: Message, state: FSMContext):
-    if not await check_admin(message):
+async def cmd_extend(message: Message, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         return
 
     await state.clear()
-    users = await queries.get_all_users()
-    
-    now = datetime.now(timezone.utc)
-    # Filter: only show users without active subscription
-    users = [u for u in users if u["subscription_until"] is None or u["subscription_until"] < now]
+    # Only users without an active subscription
+    markup = await _page_markup("ul_p_")
 
-    if not users:
+    if not markup:
         return await message.answer("📋 Obunasi yo'q foydalanuvchilar topilmadi.")
 
     await message.answer(
         "👤 Obunani uzaytirish uchun foydalanuvchini tanlang:",
-        reply_markup=kb_users_list(users, now),
+        reply_markup=markup,
     )
 
 
 @router.callback_query(F.data.startswith("extend_user_"))
-async def extend_pick_user(callback: CallbackQuery, state: FSMContext):
-    if not await check_admin(callback):
+async def extend_pick_user(callback: CallbackQuery, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
@@ -130,8 +180,8 @@ async def extend_pick_user(callback: CallbackQuery, state: FSMContext):
     await state.set_state(AdminExtendStates.waiting_months_or_date)
 
     now = datetime.now(timezone.utc)
-    name = user["full_name"] or user["username"] or f"ID{target_id}"
-    sub = user["subscription_until"]
+    name = user.full_name or user.username or f"ID{target_id}"
+    sub = user.subscription_until
     current = f"{sub.strftime('%d.%m.%Y')} gacha" if sub and sub > now else "obuna yo'q"
 
     await callback.message.edit_text(
@@ -159,7 +209,7 @@ async def extend_choose_period(callback: CallbackQuery, state: FSMContext):
         return
 
     months = int(choice.split("_")[1])
-    await _apply_extension(callback.message, state, target_id, bot=callback.bot, months=months)
+    await _apply_extension(callback.message, state, target_id, months=months)
     await callback.answer()
 
 
@@ -175,34 +225,30 @@ async def extend_custom_date(message: Message, state: FSMContext):
     if until <= datetime.now(timezone.utc):
         return await message.answer("⚠️ Sana kelajakda bo'lishi kerak.", reply_markup=kb_admin_cancel())
     
-    # Get bot instance from the message
-    await _apply_extension(message, state, target_id, bot=message.bot, until=until)
+    await _apply_extension(message, state, target_id, until=until)
 
 
-async def _apply_extension(msg, state, target_id, bot=None, months=0, until=None):
+async def _apply_extension(msg, state, target_id, months=0, until=None):
     user = await queries.get_user(target_id)
     now = datetime.now(timezone.utc)
 
     if until is None:
-        base = user["subscription_until"]
+        base = user.subscription_until
         base = base if base and base > now else now
         until = base + timedelta(days=30 * months)
 
     await queries.extend_subscription(target_id, until)
     await state.clear()
 
-    # Notify the user
-    if bot:
-        try:
-            await bot.send_message(
-                chat_id=target_id,
-                text=f"✅ Sizning obunangiz <b>{until.strftime('%d.%m.%Y')}</b> gacha uzaytirildi.\nEndi reklama berishingiz mumkin! 🚀",
-                parse_mode="HTML"
-            )
-        except Exception:
-            pass # User might have blocked the bot
-
-    name = user["full_name"] or user["username"] or f"ID{target_id}"
+    # Notify the user (queued; delivery fails quietly if they blocked the bot)
+    sender.submit(
+        target_id,
+        f"✅ Sizning obunangiz <b>{until.strftime('%d.%m.%Y')}</b> gacha uzaytirildi.\nEndi reklama berishingiz mumkin! 🚀",
+        Priority.NOTIFICATION,
+        parse_mode="HTML",
+    )
+
+    name = user.full_name or user.username or f"ID{target_id}"
     await msg.answer(
         f"✅ <b>{name}</b> obunasi <b>{until.strftime('%d.%m.%Y')}</b> gacha uzaytirildi.",
         reply_markup=kb_admin_menu(),
@@ -213,8 +259,8 @@ async def _apply_extension(msg, state, target_id, bot=None, months=0, until=None
 # ─────────────────────────── Blackout ───────────────────────────────
 
 @router.message(F.text == "🚫 Blackout", F.chat.type == ChatType.PRIVATE)
-async def cmd_blackout(message: Message, state: FSMContext):
-    if not await check_admin(message):
+async def cmd_blackout(message: Message, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         return
 
     await state.clear()
@@ -224,12 +270,12 @@ async def cmd_blackout(message: Message, state: FSMContext):
         if blackouts else
         "🚫 <b>Faol taqiqlangan davrlar yo'q.</b>\n"
     )
-    await message.answer(text, reply_markup=kb_blackout_list(blackouts), parse_mode="HTML")
+    await message.answer(text, reply_markup=kb_blackout_list(blackouts, _group_titles()), parse_mode="HTML")
 
 
 @router.callback_query(F.data == "add_blackout")
-async def add_blackout_start(callback: CallbackQuery, state: FSMContext):
-    if not await check_admin(callback):
+async def add_blackout_start(callback: CallbackQuery, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
@@ -270,17 +316,54 @@ async def blackout_get_end(message: Message, state: FSMContext):
     if end <= start:
         return await message.answer("⚠️ Tugash vaqti boshlanishidan kechroq bo'lishi kerak.", reply_markup=kb_admin_cancel())
 
-    await queries.add_blackout(start, end, message.from_user.id)
+    if len(group_registry) > 1:
+        await state.update_data(blackout_end=end.isoformat())
+        await state.set_state(AdminBlackoutStates.waiting_group)
+        return await message.answer(
+            "👥 Taqiq qaysi guruhga tegishli?", reply_markup=kb_blackout_groups(list(group_registry))
+        )
+
+    await _create_blackout(message, state, start, end, None)
+
+
+@router.callback_query(AdminBlackoutStates.waiting_group, F.data.startswith("bo_group_"))
+async def blackout_choose_group(callback: CallbackQuery, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
+        await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
+        return
+
+    data = await state.get_data()
+    choice = callback.data.removeprefix("bo_group_")
+    chat_id = None if choice == "all" else int(choice)
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await _create_blackout(
+        callback.message,
+        state,
+        datetime.fromisoformat(data["blackout_start"]),
+        datetime.fromisoformat(data["blackout_end"]),
+        chat_id,
+        created_by=callback.from_user.id,
+    )
+    await callback.answer()
+
+
+async def _create_blackout(msg, state, start, end, chat_id, created_by=None):
+    await queries.add_blackout(start, end, created_by or msg.from_user.id, chat_id)
     await state.clear()
-    await message.answer(
-        f"✅ Taqiq o'rnatildi:\n🕐 {start.strftime('%d.%m.%Y %H:%M')} — {end.strftime('%d.%m.%Y %H:%M')} UTC",
+    where = f"\n👥 {_group_titles().get(chat_id, chat_id)}" if chat_id is not None else ""
+    await msg.answer(
+        f"✅ Taqiq o'rnatildi:\n🕐 {start.strftime('%d.%m.%Y %H:%M')} — {end.strftime('%d.%m.%Y %H:%M')} UTC{where}",
         reply_markup=kb_admin_menu(),
     )
 
 
+def _group_titles() -> dict[int, str]:
+    return {g.chat_id: g.title or str(g.chat_id) for g in group_registry}
+
+
 @router.callback_query(F.data.startswith("del_blackout_"))
-async def delete_blackout(callback: CallbackQuery):
-    if not await check_admin(callback):
+async def delete_blackout(callback: CallbackQuery, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
@@ -289,19 +372,74 @@ async def delete_blackout(callback: CallbackQuery):
 
     blackouts = await queries.get_all_blackouts()
     text = "🚫 <b>Nashr qilish taqiqlangan davrlar:</b>\n" if blackouts else "🚫 <b>Faol taqiqlangan davrlar yo'q.</b>\n"
-    await callback.message.edit_text(text, reply_markup=kb_blackout_list(blackouts), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=kb_blackout_list(blackouts, _group_titles()), parse_mode="HTML")
     await callback.answer("🗑 O'chirildi")
 
 
+# ─────────────────────────── Groups ─────────────────────────────────
+
+async def _is_superadmin(user_id: int) -> bool:
+    """Role check for group-chat commands (the user middleware skips groups)."""
+    if user_id == settings.SUPERADMIN_ID:
+        return True
+    user = await queries.get_user(user_id)
+    return user is not None and user.role == "superadmin"
+
+
+@router.message(Command("addgroup"), F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
+async def cmd_addgroup(message: Message, command: CommandObject):
+    """/addgroup [cooldown_soat] — sent in a group: guard it (or update its cooldown)."""
+    if message.from_user is None or not await _is_superadmin(message.from_user.id):
+        raise SkipHandler()  # not ours — let the guard judge the message
+
+    hours = None
+    if command.args:
+        try:
+            hours = float(command.args.strip().replace(",", "."))
+        except ValueError:
+            return await message.reply("Foydalanish: /addgroup [cooldown_soat]")
+        if hours < 0:
+            return await message.reply("⚠️ Cooldown manfiy bo'lishi mumkin emas.")
+
+    await group_registry.add(message.chat.id, message.chat.title, hours)
+    await message.reply(
+        f"✅ Guruh himoyaga olindi.\n"
+        f"⏳ Reklamalar orasidagi vaqt: {group_registry.cooldown_hours(message.chat.id):g} soat"
+    )
+
+
+@router.message(Command("removegroup"), F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
+async def cmd_removegroup(message: Message):
+    if message.from_user is None or not await _is_superadmin(message.from_user.id):
+        raise SkipHandler()
+
+    if message.chat.id == settings.GROUP_ID:
+        return await message.reply("⚠️ Asosiy guruhni (.env GROUP_ID) o'chirib bo'lmaydi.")
+    await group_registry.remove(message.chat.id)
+    await message.reply("✅ Guruh endi himoya qilinmaydi.")
+
+
+@router.message(Command("groups"), F.chat.type == ChatType.PRIVATE)
+async def cmd_groups(message: Message, role: Optional[str]):
+    if role not in ADMIN_ROLES:
+        return
+
+    lines = ["👥 <b>Himoyalangan guruhlar:</b>\n"]
+    for g in group_registry:
+        lines.append(
+            f"• {g.title or '—'} (<code>{g.chat_id}</code>) — "
+            f"{group_registry.cooldown_hours(g.chat_id):g} soat"
+        )
+    lines.append("\nQo'shish: guruhda <code>/addgroup [soat]</code> (faqat superadmin)")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
 # ─────────────────────────── Roles ──────────────────────────────────
 
 @router.message(F.text == "🔑 Rollar", F.chat.type == ChatType.PRIVATE)
-async def cmd_roles_help(message: Message):
-    is_superadmin = message.from_user.id == settings.SUPERADMIN_ID
-    if not is_superadmin:
-        user = await queries.get_user(message.from_user.id)
-        if not user or user["role"] != "superadmin":
-            return await message.answer("⛔ Faqat superadmin uchun.")
+async def cmd_roles_help(message: Message, role: Optional[str]):
+    if role != "superadmin":
+        return await message.answer("⛔ Faqat superadmin uchun.")
 
     await message.answer(
         "🔑 <b>Rollarni boshqarish</b>\n\n"
@@ -314,12 +452,9 @@ async def cmd_roles_help(message: Message):
 
 
 @router.message(Command("setrole"), F.chat.type == ChatType.PRIVATE)
-async def cmd_setrole(message: Message):
-    is_superadmin = message.from_user.id == settings.SUPERADMIN_ID
-    if not is_superadmin:
-        user = await queries.get_user(message.from_user.id)
-        if not user or user["role"] != "superadmin":
-            return await message.answer("⛔ Faqat superadmin uchun.")
+async def cmd_setrole(message: Message, role: Optional[str]):
+    if role != "superadmin":
+        return await message.answer("⛔ Faqat superadmin uchun.")
 
     parts = message.text.strip().split()
     if len(parts) != 3:
@@ -327,64 +462,54 @@ async def cmd_setrole(message: Message):
 
     try:
         target_id = int(parts[1])
-        role = parts[2]
+        new_role = parts[2]
     except ValueError:
         return await message.answer("⚠️ Noto'g'ri format.")
 
-    if role not in ("client", "admin", "superadmin"):
+    if new_role not in ("client", "admin", "superadmin"):
         return await message.answer("⚠️ Rol: client, admin yoki superadmin.")
 
     target = await queries.get_user(target_id)
     if not target:
         return await message.answer("❌ Foydalanuvchi topilmadi.")
 
-    await queries.set_role(target_id, role)
-    await message.answer(f"✅ {target_id} foydalanuvchi roli <b>{role}</b> ga o'zgartirildi.", parse_mode="HTML")
+    await queries.set_role(target_id, new_role)
+    await message.answer(f"✅ {target_id} foydalanuvchi roli <b>{new_role}</b> ga o'zgartirildi.", parse_mode="HTML")
 
 
 # ─────────────────────────── Pagination ────────────────────────────
 
 @router.callback_query(F.data.startswith("ul_p_"))
-async def extend_list_page(callback: CallbackQuery, state: FSMContext):
+async def extend_list_page(callback: CallbackQuery, state: FSMContext, role: Optional[str]):
     """Navigate pages in the 'Uzaytirish' user list."""
-    if not await check_admin(callback):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
-    page = int(callback.data.split("ul_p_")[1])
-    now = datetime.now(timezone.utc)
-    users = await queries.get_all_users()
-    users = [u for u in users if u["subscription_until"] is None or u["subscription_until"] < now]
+    markup = await _page_markup("ul_p_", callback.data)
 
-    if not users:
+    if not markup:
         await callback.answer("📋 Obunasi yo'q foydalanuvchilar topilmadi.", show_alert=True)
         return
 
-    await callback.message.edit_reply_markup(
-        reply_markup=kb_users_list(users, now, page=page)
-    )
+    await callback.message.edit_reply_markup(reply_markup=markup)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("vul_p_"))
-async def view_list_page(callback: CallbackQuery):
+async def view_list_page(callback: CallbackQuery, role: Optional[str]):
     """Navigate pages in the 'Obunalar' view list."""
-    if not await check_admin(callback):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
-    page = int(callback.data.split("vul_p_")[1])
-    now = datetime.now(timezone.utc)
-    users = await queries.get_all_users()
-    active_users = [u for u in users if u["subscription_until"] and u["subscription_until"] > now]
+    markup = await _page_markup("vul_p_", callback.data)
 
-    if not active_users:
+    if not markup:
         await callback.answer("📋 Faol obunaga ega foydalanuvchilar topilmadi.", show_alert=True)
         return
 
-    await callback.message.edit_reply_markup(
-        reply_markup=kb_view_users_list(active_users, now, page=page)
-    )
+    await callback.message.edit_reply_markup(reply_markup=markup)
     await callback.answer()
 
 
@@ -397,27 +522,25 @@ async def noop_callback(callback: CallbackQuery):
 # ─────────────────────────── Remove Subscription ────────────────────
 
 @router.message(F.text == "🗑 Obunani bekor qilish", F.chat.type == ChatType.PRIVATE)
-async def cmd_remove_sub(message: Message):
-    if not await check_admin(message):
+async def cmd_remove_sub(message: Message, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         return
 
-    now = datetime.now(timezone.utc)
-    users = await queries.get_all_users()
-    active_users = [u for u in users if u["subscription_until"] and u["subscription_until"] > now]
+    markup = await _page_markup("rs_p_")
 
-    if not active_users:
+    if not markup:
         return await message.answer("📋 Faol obunaga ega foydalanuvchilar topilmadi.")
 
     await message.answer(
         "🗑 <b>Obunani bekor qilish:</b>\nFoydalanuvchini tanlang:",
-        reply_markup=kb_remove_sub_list(active_users, now),
+        reply_markup=markup,
         parse_mode="HTML",
     )
 
 
 @router.callback_query(F.data.startswith("remove_sub_"))
-async def confirm_remove_sub(callback: CallbackQuery, bot: Bot):
-    if not await check_admin(callback):
+async def confirm_remove_sub(callback: CallbackQuery, role: Optional[str]):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
@@ -429,28 +552,24 @@ async def confirm_remove_sub(callback: CallbackQuery, bot: Bot):
 
     await queries.remove_subscription(target_id)
 
-    name = user["full_name"] or user["username"] or f"ID{target_id}"
+    name = user.full_name or user.username or f"ID{target_id}"
 
-    # Notify the user
-    try:
-        await bot.send_message(
-            chat_id=target_id,
-            text="❌ Sizning obunangiz admin tomonidan bekor qilindi.\n"
-                 "Obunani qayta faollashtirish uchun @jondor_admin1 ga murojaat qiling.",
-        )
-    except Exception:
-        pass  # User may have blocked the bot
+    # Notify the user (queued; delivery fails quietly if they blocked the bot)
+    sender.submit(
+        target_id,
+        "❌ Sizning obunangiz admin tomonidan bekor qilindi.\n"
+        "Obunani qayta faollashtirish uchun @jondor_admin1 ga murojaat qiling.",
+        Priority.NOTIFICATION,
+    )
 
     # Refresh the list
-    now = datetime.now(timezone.utc)
-    users = await queries.get_all_users()
-    active_users = [u for u in users if u["subscription_until"] and u["subscription_until"] > now]
+    markup = await _page_markup("rs_p_")
 
-    if active_users:
+    if markup:
         await callback.message.edit_text(
             f"✅ <b>{name}</b> obunasi bekor qilindi.\n\n"
             "🗑 <b>Obunani bekor qilish:</b>\nFoydalanuvchini tanlang:",
-            reply_markup=kb_remove_sub_list(active_users, now),
+            reply_markup=markup,
             parse_mode="HTML",
         )
     else:
@@ -465,27 +584,98 @@ async def confirm_remove_sub(callback: CallbackQuery, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("rs_p_"))
-async def remove_sub_list_page(callback: CallbackQuery):
+async def remove_sub_list_page(callback: CallbackQuery, role: Optional[str]):
     """Navigate pages in the remove-subscription list."""
-    if not await check_admin(callback):
+    if role not in ADMIN_ROLES:
         await callback.answer("⛔ Kirish taqiqlangan.", show_alert=True)
         return
 
-    page = int(callback.data.split("rs_p_")[1])
-    now = datetime.now(timezone.utc)
-    users = await queries.get_all_users()
-    active_users = [u for u in users if u["subscription_until"] and u["subscription_until"] > now]
+    markup = await _page_markup("rs_p_", callback.data)
 
-    if not active_users:
+    if not markup:
         await callback.answer("📋 Faol obunaga ega foydalanuvchilar topilmadi.", show_alert=True)
         return
 
-    await callback.message.edit_reply_markup(
-        reply_markup=kb_remove_sub_list(active_users, now, page=page)
-    )
+    await callback.message.edit_reply_markup(reply_markup=markup)
     await callback.answer()
 
 
+# ─────────────────────────── Search ─────────────────────────────────
+
+@router.message(F.text == "🔍 Qidirish", F.chat.type == ChatType.PRIVATE)
+async def cmd_search(message: Message, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
+        return
+
+    await state.set_state(AdminSearchStates.waiting_query)
+    await message.answer(
+        "🔍 Ism, username, telefon raqami yoki Telegram ID ni kiriting:",
+        reply_markup=kb_admin_cancel(),
+    )
+
+
+@router.message(AdminSearchStates.waiting_query, F.text, F.chat.type == ChatType.PRIVATE)
+async def search_get_query(message: Message, state: FSMContext, role: Optional[str]):
+    if role not in ADMIN_ROLES:
+        await state.clear()
+        return
+
+    term = message.text.strip()
+    if len(term) < SEARCH_MIN_LENGTH and not term.isdigit():
+        return await message.answer(
+            f"⚠️ Kamida {SEARCH_MIN_LENGTH} ta belgi kiriting:", reply_markup=kb_admin_cancel()
+        )
+
+    users = await queries.search_users(term, PAGE_SIZE)
+    if not users:
+        return await message.answer(
+            "🔍 Hech narsa topilmadi. Boshqa so'rov kiriting:", reply_markup=kb_admin_cancel()
+        )
+
+    await state.clear()
+    more = f"\n(faqat birinchi {PAGE_SIZE} ta)" if len(users) == PAGE_SIZE else ""
+    await message.answer(
+        f"🔍 <b>Natijalar:</b> {len(users)}{more}",
+        reply_markup=kb_search_results(users, datetime.now(timezone.utc)),
+        parse_mode="HTML",
+    )
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, role: Optional[str]):
+    """@bot <so'rov> — results update as the admin types (inline mode must be on)."""
+    term = inline_query.query.strip()
+    too_short = len(term) < SEARCH_MIN_LENGTH and not term.isdigit()
+    if role not in ADMIN_ROLES or too_short:
+        await inline_query.answer([], cache_time=5, is_personal=True)
+        return
+
+    users = await queries.search_users(term, PAGE_SIZE)
+    now = datetime.now(timezone.utc)
+    results = []
+    for u in users:
+        name = u.full_name or u.username or f"ID{u.telegram_id}"
+        sub = u.subscription_until
+        status = f"✅ {sub.strftime('%d.%m.%Y')} gacha" if sub and sub > now else "❌ obuna yo'q"
+        results.append(InlineQueryResultArticle(
+            id=str(u.telegram_id),
+            title=name,
+            description=f"{u.phone or '—'} | {u.role} | {status}",
+            input_message_content=InputTextMessageContent(
+                message_text=(
+                    f"👤 {name}\n"
+                    f"🆔 ID: {u.telegram_id}\n"
+                    f"📞 Tel: {u.phone or '—'}\n"
+                    f"🌐 Username: @{u.username or '—'}\n"
+                    f"👮 Rol: {u.role}\n"
+                    f"📅 Obuna: {status}"
+                ),
+                parse_mode=None,
+            ),
+        ))
+    await inline_query.answer(results, cache_time=5, is_personal=True)
+
+
 # ─────────────────────────── Universal cancel ───────────────────────
 
 @router.callback_query(F.data == "admin_cancel")
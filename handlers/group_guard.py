@@ -1,25 +1,63 @@
-from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 from aiogram import Router, F, Bot
 from aiogram.enums import ChatType
-from aiogram.types import Message
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import ChatPermissions, Message, ChatMemberUpdated, User
 from cachetools import TTLCache
 
 from config import settings
 from db import queries
+from services.ad_log import ad_log
+from services.cooldown import cooldown
+from services.delete_queue import delete_queue
+from services.duplicates import Fingerprint, duplicate_index
+from services.flood import flood_limiter
+from services.groups import GuardedGroup, group_registry
+from services.message_expiry import message_expiry
+from services.metrics import guard_outcomes
+from services.sender import Priority, sender
 
 router = Router()
+logger = logging.getLogger(__name__)
 
 ADMIN_ROLES = {"admin", "superadmin"}
 
-# Tracks media_group_ids we've already notified about.
-# Holds up to 256 entries, each expires after 10 seconds.
-_notified_groups: TTLCache = TTLCache(maxsize=256, ttl=10)
+# Guard decisions (also logged as ads.reason)
+ALLOWED = "allowed"
+BLACKOUT = "blackout"
+COOLDOWN = "cooldown"
+DUPLICATE = "duplicate"
+FLOOD = "flood"
+NOT_SUBSCRIBED = "not_subscribed"
+
+# Album parts still inside their batching window, by media_group_id.
+_pending_albums: dict[str, list[Message]] = {}
+
+# Decision (rejection reason, or None if allowed) for albums already
+# handled, so parts arriving after the window follow it without a second
+# check or notification. Holds up to 256 entries, each expires after 60 seconds.
+_album_decisions: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+# Running album batch tasks (strong refs so they aren't garbage-collected).
+_album_tasks: set[asyncio.Task] = set()
+
+
+@router.chat_member(GuardedGroup())
+@router.my_chat_member(GuardedGroup())
+async def group_member_updated(event: ChatMemberUpdated):
+    """Keep the group's admin roster in sync with promotions/demotions as they happen."""
+    member = event.new_chat_member
+    group_registry.roster(event.chat.id).apply(member.user.id, member.status)
 
 
 @router.message(
     F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-    F.chat.id == settings.GROUP_ID,
+    GuardedGroup(),
 )
 async def group_message_guard(message: Message, bot: Bot):
     """Delete posts from users without an active subscription."""
@@ -28,69 +66,210 @@ async def group_message_guard(message: Message, bot: Bot):
     if message.from_user is None or message.from_user.is_bot:
         return
 
+    # Floods are deleted before any network or DB work
+    if await _flood_guard(message, bot):
+        return
+
+    media_group_id = message.media_group_id
+    if media_group_id is None:
+        decision, reason, fingerprint = await _check_post([message], bot)
+        await _apply_decision(bot, [message], decision, reason, fingerprint)
+        return
+
+    # ── Albums are handled as one unit ───────────────────────────────
+    if media_group_id in _album_decisions:
+        # Straggler of an album we already ruled on — no new notification
+        if _album_decisions[media_group_id]:
+            delete_queue.add(message.chat.id, [message.message_id])
+        return
+
+    parts = _pending_albums.get(media_group_id)
+    if parts is not None:
+        parts.append(message)
+        return
+
+    _pending_albums[media_group_id] = [message]
+    task = asyncio.create_task(_handle_album(media_group_id, bot))
+    _album_tasks.add(task)
+    task.add_done_callback(_album_tasks.discard)
+
+
+async def _handle_album(media_group_id: str, bot: Bot):
+    """Wait for the rest of the album, then check and act on it once."""
+    try:
+        await asyncio.sleep(settings.ALBUM_BATCH_WINDOW)
+        decision, reason, fingerprint = await _check_post(_pending_albums[media_group_id], bot)
+
+        # Parts that arrived while checking are still collected here;
+        # from now on stragglers go through _album_decisions instead.
+        parts = _pending_albums.pop(media_group_id)
+        _album_decisions[media_group_id] = reason
+        await _apply_decision(bot, parts, decision, reason, fingerprint)
+    except Exception:
+        _pending_albums.pop(media_group_id, None)
+        logger.exception("Failed to handle album %s", media_group_id)
+
+
+async def _flood_guard(message: Message, bot: Bot) -> bool:
+    """Delete the message if its sender is over the flood limit; True if so.
+
+    An album counts as one post: parts after the first are left to the
+    album batching. Only the checks that need no I/O (superadmin, loaded
+    admin roster) run first.
+    """
+    if not flood_limiter.enabled:
+        return False
+    media_group_id = message.media_group_id
+    if media_group_id in _pending_albums or media_group_id in _album_decisions:
+        return False
     user_id = message.from_user.id
+    chat_id = message.chat.id
+    if user_id == settings.SUPERADMIN_ID:
+        return False
+    roster = group_registry.roster(chat_id)
+    if roster.loaded and user_id in roster:
+        return False
+
+    over = flood_limiter.hit(chat_id, user_id, time.monotonic())
+    if not over:
+        return False
+
+    delete_queue.add(chat_id, [message.message_id])
+    ad_log.add_post([message], FLOOD, allowed=False)
+    guard_outcomes.inc(FLOOD)
+    if over == 1 and settings.FLOOD_RESTRICT_MINUTES:
+        until = datetime.now(timezone.utc) + timedelta(minutes=settings.FLOOD_RESTRICT_MINUTES)
+        try:
+            await bot.restrict_chat_member(
+                chat_id=chat_id,
+                user_id=user_id,
+                permissions=ChatPermissions(can_send_messages=False),
+                until_date=until,
+            )
+        except TelegramAPIError as e:
+            # e.g. the bot lacks the 'Ban users' permission
+            logger.warning("Could not restrict flooding user %s in %s: %s", user_id, chat_id, e)
+    return True
+
+
+async def drain_albums():
+    """Wait for album batches still inside their window (used at shutdown)."""
+    while _album_tasks:
+        await asyncio.wait(set(_album_tasks))
+
+
+async def _check_post(
+    parts: list[Message], bot: Bot
+) -> tuple[str, Optional[str], Optional[Fingerprint]]:
+    """Return (decision, rejection reason, fingerprint) for a post.
+
+    The reason is None if the post may stay. The fingerprint is set only
+    for posts added to the duplicate index, to be stored with the ad log.
+    """
+    message = parts[0]
+    user_id = message.from_user.id
+    chat_id = message.chat.id
 
     # ── .env superadmin always passes through ────────────────────────
     if user_id == settings.SUPERADMIN_ID:
-        return
+        return ALLOWED, None, None
 
     # ── Telegram-native admin check (most reliable) ──────────────────
     # If Telegram itself says the user is a group creator or admin, let them post.
-    try:
-        member = await bot.get_chat_member(chat_id=message.chat.id, user_id=user_id)
-        if member.status in {"creator", "administrator"}:
-            return
-    except Exception:
-        pass  # If we can't check, fall through to DB check
+    # The roster is held locally; only ask Telegram until it has been loaded.
+    roster = group_registry.roster(chat_id)
+    if roster.loaded:
+        if user_id in roster:
+            return ALLOWED, None, None
+    else:
+        try:
+            member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            if member.status in {"creator", "administrator"}:
+                return ALLOWED, None, None
+        except Exception:
+            pass  # If we can't check, fall through to DB check
 
-    user = await queries.get_user(user_id)
+    # Role + subscription only, served from the process-local auth cache
+    user = await queries.get_user_auth(user_id)
     now = datetime.now(timezone.utc)
 
     # DB role check as a secondary safeguard
-    if user and user["role"] in ADMIN_ROLES:
-        return
+    if user and user.role in ADMIN_ROLES:
+        return ALLOWED, None, None
 
-    # Subscribed user — check blackout
-    if user and user["subscription_until"] and user["subscription_until"] > now:
-        blackout = await queries.get_active_blackout(now)
-        if not blackout:
-            return  # All good — subscribed, no blackout active
-        end_str = blackout["end_datetime"].strftime("%d.%m.%Y %H:%M")
-        reason = (
-            f"🚫 Hozir nashr qilish vaqtincha taqiqlangan.\n"
-            f"⏰ {end_str} (UTC) dan keyin harakat qilib ko'ring."
-        )
-    elif user is None:
-        reason = (
-            f"❌ Hurmatli {message.from_user.full_name}\n"
-            "Guruhga yozish uchun admin tomonidan ruxsat olishingiz kerak!\n"
-            "@jondor_admin1 ga yozing!✅"
-        )
-    else:
-        # Registered but no active subscription
-        reason = (
-            f"❌ Hurmatli {user['full_name']}\n"
-            "Guruhga yozish uchun admin tomonidan ruxsat olishingiz kerak!\n"
-            "@jondor_admin1 ga yozing!✅"
-        )
-
-    # Delete the unauthorized post (every photo/video in the album)
-    try:
-        await message.delete()
-    except Exception:
-        pass  # Bot must have 'Delete messages' permission in the group
+    # Subscribed user — check blackout, the posting cooldown, then repeats
+    if user and user.subscription_until and user.subscription_until > now:
+        blackout_end = await queries.get_blackout_end(now, chat_id)
+        if blackout_end:
+            end_str = blackout_end.strftime("%d.%m.%Y %H:%M")
+            return BLACKOUT, (
+                f"🚫 Hozir nashr qilish vaqtincha taqiqlangan.\n"
+                f"⏰ {end_str} (UTC) dan keyin harakat qilib ko'ring."
+            ), None
+        allowed_at = cooldown.next_allowed(chat_id, user_id, now)
+        if allowed_at:
+            hours = f"{group_registry.cooldown_hours(chat_id):g}"
+            return COOLDOWN, (
+                f"⏳ Reklamalar orasida {hours} soat kutish kerak.\n"
+                f"⏰ {allowed_at.strftime('%d.%m.%Y %H:%M')} (UTC) dan keyin qayta joylashingiz mumkin."
+            ), None
 
-    # For media groups (albums), only send ONE notification for the whole album.
-    media_group_id = message.media_group_id
-    if media_group_id:
-        if media_group_id in _notified_groups:
-            return  # Already notified for this album — skip
-        _notified_groups[media_group_id] = True
-
-    # Notify in the group, mention the user by clickable name
-    user_mention = f'<a href="tg://user?id={user_id}">{message.from_user.full_name}</a>'
-    await bot.send_message(
-        chat_id=message.chat.id,
-        text=f"👤 {user_mention}\n\n{reason}",
+        fingerprint = Fingerprint.of(parts) if duplicate_index.enabled else None
+        if fingerprint:
+            original = duplicate_index.find(chat_id, fingerprint, now)
+            if original:
+                if settings.DUPLICATE_ACTION == "reject":
+                    return DUPLICATE, (
+                        f"♻️ Bu e'lon guruhda {original.at.strftime('%d.%m.%Y %H:%M')} (UTC) da "
+                        "joylangan. Bir xil e'lonni qayta joylab bo'lmaydi."
+                    ), None
+                # Flagged: the post stays, the ad log records it as a repeat
+                cooldown.mark(chat_id, user_id, now)
+                return DUPLICATE, None, None
+            duplicate_index.add(chat_id, user_id, fingerprint, now)
+
+        # All good — subscribed, no blackout, cooldown over (an album counts once)
+        cooldown.mark(chat_id, user_id, now)
+        return ALLOWED, None, fingerprint or None
+
+    # Not registered, or registered but no active subscription
+    return NOT_SUBSCRIBED, (
+        f"❌ Hurmatli {message.from_user.full_name}\n"
+        "Guruhga yozish uchun admin tomonidan ruxsat olishingiz kerak!\n"
+        "@jondor_admin1 ga yozing!✅"
+    ), None
+
+
+async def _apply_decision(
+    bot: Bot,
+    parts: list[Message],
+    decision: str,
+    reason: Optional[str],
+    fingerprint: Optional[Fingerprint] = None,
+):
+    """Log the post (one entry per album) and reject it if it may not stay."""
+    ad_log.add_post(parts, decision, allowed=reason is None, fingerprint=fingerprint)
+    guard_outcomes.inc(decision)
+    if reason:
+        first = parts[0]
+        message_ids = [m.message_id for m in parts]
+        await _reject(bot, first.chat.id, message_ids, first.from_user, reason)
+
+
+async def _reject(bot: Bot, chat_id: int, message_ids: list[int], user: User, reason: str):
+    """Delete an unauthorized post (all album parts) and explain why, once."""
+    # Bulk-deleted in the background (bot needs 'Delete messages' permission)
+    delete_queue.add(chat_id, message_ids)
+
+    # Notify in the group, mention the user by clickable name; the warning
+    # itself is removed again after WARNING_TTL
+    user_mention = f'<a href="tg://user?id={user.id}">{user.full_name}</a>'
+    warning = sender.submit(
+        chat_id,
+        f"👤 {user_mention}\n\n{reason}",
+        Priority.GROUP_WARNING,
         parse_mode="HTML",
     )
+    if settings.WARNING_TTL:
+        message_expiry.delete_later(warning, settings.WARNING_TTL)
+
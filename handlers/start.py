@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.enums import ChatType
@@ -5,6 +7,7 @@ from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from db import queries
+from db.records import UserProfile
 from keyboards.keys import kb_request_contact, kb_admin_menu, kb_remove
 from states.forms import RegistrationStates
 from config import settings
@@ -19,13 +22,13 @@ def _menu_for(role: str):
 
 
 @router.message(CommandStart(), F.chat.type == ChatType.PRIVATE)
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, db_user: Optional[UserProfile]):
     await state.clear()
-    user = await queries.get_user(message.from_user.id)
+    user = db_user
 
     # Superadmin auto-setup
     if message.from_user.id == settings.SUPERADMIN_ID and (
-        user is None or user["role"] != "superadmin"
+        user is None or user.role != "superadmin"
     ):
         if user is None:
             await queries.create_user(
@@ -54,7 +57,7 @@ async def cmd_start(message: Message, state: FSMContext):
 
     await message.answer(
         f"👋 Xush kelibsiz, {message.from_user.first_name}!",
-        reply_markup=_menu_for(user["role"]),
+        reply_markup=_menu_for(user.role),
     )
 
 
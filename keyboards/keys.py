@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -10,184 +12,243 @@ PAGE_SIZE = 10  # Max user buttons per page
 
 
 # ─── Reply keyboards ────────────────────────────────────────────────
+# Fixed keyboards are built once at import and shared; markups are never
+# mutated after being sent, so one instance serves every chat.
+
+_REQUEST_CONTACT = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="📱 Raqamni ulashish", request_contact=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+_ADMIN_MENU = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text="👥 Obunalar"),
+            KeyboardButton(text="➕ Uzaytirish"),
+        ],
+        [
+            KeyboardButton(text="🚫 Blackout"),
+            KeyboardButton(text="🔑 Rollar"),
+        ],
+        [
+            KeyboardButton(text="🔍 Qidirish"),
+            KeyboardButton(text="🗑 Obunani bekor qilish"),
+        ],
+    ],
+    resize_keyboard=True,
+)
+
+_REMOVE = ReplyKeyboardRemove()
+
 
 def kb_request_contact() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text="📱 Raqamni ulashish", request_contact=True)]],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
+    return _REQUEST_CONTACT
 
 
 def kb_main_menu() -> ReplyKeyboardRemove:
     """Clients use the group directly — no private-chat action buttons needed."""
-    return ReplyKeyboardRemove()
+    return _REMOVE
 
 
 def kb_admin_menu() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text="👥 Obunalar"),
-                KeyboardButton(text="➕ Uzaytirish"),
-            ],
-            [
-                KeyboardButton(text="🚫 Blackout"),
-                KeyboardButton(text="🔑 Rollar"),
-            ],
-            [
-                KeyboardButton(text="🗑 Obunani bekor qilish"),
-            ],
-        ],
-        resize_keyboard=True,
-    )
+    return _ADMIN_MENU
 
 
 def kb_remove() -> ReplyKeyboardRemove:
-    return ReplyKeyboardRemove()
+    return _REMOVE
 
 
 # ─── Inline keyboards ───────────────────────────────────────────────
 
+_CANCEL_ROW = [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="admin_cancel")]
+_CLOSE_ROW = [InlineKeyboardButton(text="❌ Yopish", callback_data="admin_cancel")]
+
+_EXTEND_MONTHS = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text="1 oy", callback_data="extend_1"),
+            InlineKeyboardButton(text="2 oy", callback_data="extend_2"),
+            InlineKeyboardButton(text="3 oy", callback_data="extend_3"),
+        ],
+        [InlineKeyboardButton(text="📅 Sanani qo'lda kiritish", callback_data="extend_custom")],
+        _CANCEL_ROW,
+    ]
+)
+
+_ADMIN_CANCEL = InlineKeyboardMarkup(inline_keyboard=[_CANCEL_ROW])
+
 
 def kb_extend_months() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="1 oy", callback_data="extend_1"),
-                InlineKeyboardButton(text="2 oy", callback_data="extend_2"),
-                InlineKeyboardButton(text="3 oy", callback_data="extend_3"),
-            ],
-            [InlineKeyboardButton(text="📅 Sanani qo'lda kiritish", callback_data="extend_custom")],
-            [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="admin_cancel")],
-        ]
-    )
+    return _EXTEND_MONTHS
 
 
 def kb_admin_cancel() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="admin_cancel")]
-        ]
-    )
+    return _ADMIN_CANCEL
 
 
-def kb_users_list(users: list, now, page: int = 0) -> InlineKeyboardMarkup:
-    """Paginated list of users for subscription extension.
-    callback prefix: ul_p_{page}
+def page_callback(prefix: str, page: int, direction: str, cursor_id: int) -> str:
+    """callback_data for a page flip: ``{prefix}{page}_{a|b}{cursor_id}``.
+
+    ``a`` = the page after row ``cursor_id``, ``b`` = the page before it.
+    """
+    return f"{prefix}{page}_{direction}{cursor_id}"
+
+
+def parse_page_callback(data: str, prefix: str) -> tuple[int, Optional[int], Optional[int]]:
+    """Inverse of page_callback → (page, after_id, before_id).
+
+    Anything unparsable (e.g. buttons sent before keyset pagination) opens
+    the first page.
+    """
+    try:
+        page_str, cursor = data[len(prefix):].split("_")
+        page, direction, cursor_id = int(page_str), cursor[0], int(cursor[1:])
+    except (ValueError, IndexError):
+        return 0, None, None
+    if direction == "a":
+        return page, cursor_id, None
+    if direction == "b":
+        return page, None, cursor_id
+    return 0, None, None
+
+
+def _nav_row(prefix: str, users: list, page: int, total: int) -> list[InlineKeyboardButton]:
+    """Navigation for one page of rows from queries.get_users_page.
+    ``total`` is the size of the whole filtered list.
     """
-    total_pages = max(1, (len(users) + PAGE_SIZE - 1) // PAGE_SIZE)
+    total_pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
     page = max(0, min(page, total_pages - 1))
-    start = page * PAGE_SIZE
-    page_users = users[start : start + PAGE_SIZE]
+    nav = []
+    if page > 0 and users:
+        nav.append(InlineKeyboardButton(
+            text="⬅ Orqaga", callback_data=page_callback(prefix, page - 1, "b", users[0].id)
+        ))
+    if total_pages > 1:
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
+    if page < total_pages - 1 and users:
+        nav.append(InlineKeyboardButton(
+            text="Oldinga ➡", callback_data=page_callback(prefix, page + 1, "a", users[-1].id)
+        ))
+    return nav
+
 
+def kb_users_list(users: list, now, page: int = 0, total: int = 0) -> InlineKeyboardMarkup:
+    """Paginated list of users for subscription extension.
+    callback prefix: ul_p_{page}_{a|b}{cursor_id}
+    """
     buttons = []
-    for u in page_users:
-        name = u["full_name"] or u["username"] or f"ID{u['telegram_id']}"
-        sub = u["subscription_until"]
+    for u in users:
+        name = u.full_name or u.username or f"ID{u.telegram_id}"
+        sub = u.subscription_until
         status = f"✅ {sub.strftime('%d.%m')} gacha" if sub and sub > now else "❌ yo'q"
-        role_badge = " 👮" if u["role"] == "admin" else ""
-        phone = u["phone"] or "—"
+        role_badge = " 👮" if u.role == "admin" else ""
+        phone = u.phone or "—"
         buttons.append([
             InlineKeyboardButton(
                 text=f"{name}{role_badge} | {phone} — {status}",
-                callback_data=f"extend_user_{u['telegram_id']}",
+                callback_data=f"extend_user_{u.telegram_id}",
             )
         ])
 
     # Navigation row
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton(text="⬅ Orqaga", callback_data=f"ul_p_{page - 1}"))
-    if total_pages > 1:
-        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
-    if page < total_pages - 1:
-        nav.append(InlineKeyboardButton(text="Oldinga ➡", callback_data=f"ul_p_{page + 1}"))
+    nav = _nav_row("ul_p_", users, page, total)
     if nav:
         buttons.append(nav)
 
-    buttons.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data="admin_cancel")])
+    buttons.append(_CANCEL_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def kb_view_users_list(users: list, now, page: int = 0) -> InlineKeyboardMarkup:
+def kb_view_users_list(users: list, now, page: int = 0, total: int = 0) -> InlineKeyboardMarkup:
     """Paginated list of users with active subscriptions.
-    callback prefix: vul_p_{page}
+    callback prefix: vul_p_{page}_{a|b}{cursor_id}
     """
-    total_pages = max(1, (len(users) + PAGE_SIZE - 1) // PAGE_SIZE)
-    page = max(0, min(page, total_pages - 1))
-    start = page * PAGE_SIZE
-    page_users = users[start : start + PAGE_SIZE]
-
     buttons = []
-    for u in page_users:
-        name = u["full_name"] or u["username"] or f"ID{u['telegram_id']}"
-        sub = u["subscription_until"]
+    for u in users:
+        name = u.full_name or u.username or f"ID{u.telegram_id}"
+        sub = u.subscription_until
         status = f"✅ {sub.strftime('%d.%m')} gacha" if sub and sub > now else "❌ yo'q"
-        role_badge = " 👮" if u["role"] == "admin" else ""
+        role_badge = " 👮" if u.role == "admin" else ""
         buttons.append([
             InlineKeyboardButton(
                 text=f"{name}{role_badge} — {status}",
-                callback_data=f"view_user_{u['telegram_id']}",
+                callback_data=f"view_user_{u.telegram_id}",
             )
         ])
 
     # Navigation row
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton(text="⬅ Orqaga", callback_data=f"vul_p_{page - 1}"))
-    if total_pages > 1:
-        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
-    if page < total_pages - 1:
-        nav.append(InlineKeyboardButton(text="Oldinga ➡", callback_data=f"vul_p_{page + 1}"))
+    nav = _nav_row("vul_p_", users, page, total)
     if nav:
         buttons.append(nav)
 
-    buttons.append([InlineKeyboardButton(text="❌ Yopish", callback_data="admin_cancel")])
+    buttons.append(_CLOSE_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def kb_blackout_list(blackouts: list) -> InlineKeyboardMarkup:
+def kb_search_results(users: list, now) -> InlineKeyboardMarkup:
+    """One page of queries.search_users matches, opening the user card."""
+    buttons = []
+    for u in users:
+        name = u.full_name or u.username or f"ID{u.telegram_id}"
+        sub = u.subscription_until
+        status = f"✅ {sub.strftime('%d.%m')} gacha" if sub and sub > now else "❌ yo'q"
+        role_badge = " 👮" if u.role == "admin" else ""
+        phone = u.phone or "—"
+        buttons.append([
+            InlineKeyboardButton(
+                text=f"{name}{role_badge} | {phone} — {status}",
+                callback_data=f"view_user_{u.telegram_id}",
+            )
+        ])
+    buttons.append(_CLOSE_ROW)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def kb_blackout_list(blackouts: list, titles: Optional[dict] = None) -> InlineKeyboardMarkup:
+    """``titles``: chat_id → group name, for blackouts limited to one group."""
     buttons = []
     for b in blackouts:
-        label = f"🗑 #{b['id']} {b['start_datetime'].strftime('%d.%m %H:%M')} – {b['end_datetime'].strftime('%d.%m %H:%M')}"
-        buttons.append([InlineKeyboardButton(text=label, callback_data=f"del_blackout_{b['id']}")])
+        label = f"🗑 #{b.id} {b.start_datetime.strftime('%d.%m %H:%M')} – {b.end_datetime.strftime('%d.%m %H:%M')}"
+        if b.chat_id is not None:
+            label += f" · {(titles or {}).get(b.chat_id, b.chat_id)}"
+        buttons.append([InlineKeyboardButton(text=label, callback_data=f"del_blackout_{b.id}")])
     buttons.append([InlineKeyboardButton(text="➕ Qo'shish", callback_data="add_blackout")])
-    buttons.append([InlineKeyboardButton(text="❌ Yopish", callback_data="admin_cancel")])
+    buttons.append(_CLOSE_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def kb_remove_sub_list(users: list, now, page: int = 0) -> InlineKeyboardMarkup:
+def kb_blackout_groups(groups: list) -> InlineKeyboardMarkup:
+    """Which group a new blackout applies to."""
+    buttons = [[InlineKeyboardButton(text="🌐 Barcha guruhlar", callback_data="bo_group_all")]]
+    for g in groups:
+        buttons.append([InlineKeyboardButton(
+            text=g.title or str(g.chat_id), callback_data=f"bo_group_{g.chat_id}"
+        )])
+    buttons.append(_CANCEL_ROW)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def kb_remove_sub_list(users: list, now, page: int = 0, total: int = 0) -> InlineKeyboardMarkup:
     """Paginated list of active subscribers for subscription removal.
-    callback prefix: rs_p_{page}
+    callback prefix: rs_p_{page}_{a|b}{cursor_id}
     """
-    total_pages = max(1, (len(users) + PAGE_SIZE - 1) // PAGE_SIZE)
-    page = max(0, min(page, total_pages - 1))
-    start = page * PAGE_SIZE
-    page_users = users[start : start + PAGE_SIZE]
-
     buttons = []
-    for u in page_users:
-        name = u["full_name"] or u["username"] or f"ID{u['telegram_id']}"
-        sub = u["subscription_until"]
+    for u in users:
+        name = u.full_name or u.username or f"ID{u.telegram_id}"
+        sub = u.subscription_until
         until_str = sub.strftime('%d.%m.%Y') if sub else "—"
         buttons.append([
             InlineKeyboardButton(
                 text=f"🗑 {name} — {until_str} gacha",
-                callback_data=f"remove_sub_{u['telegram_id']}",
+                callback_data=f"remove_sub_{u.telegram_id}",
             )
         ])
 
     # Navigation row
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton(text="⬅ Orqaga", callback_data=f"rs_p_{page - 1}"))
-    if total_pages > 1:
-        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
-    if page < total_pages - 1:
-        nav.append(InlineKeyboardButton(text="Oldinga ➡", callback_data=f"rs_p_{page + 1}"))
+    nav = _nav_row("rs_p_", users, page, total)
     if nav:
         buttons.append(nav)
 
-    buttons.append([InlineKeyboardButton(text="❌ Yopish", callback_data="admin_cancel")])
+    buttons.append(_CLOSE_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
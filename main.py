@@ -2,15 +2,35 @@ import asyncio
 import asyncpg
 import logging
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from config import settings
 from db import queries
-from db.models import ALL_TABLES
+from db.cache import auth_cache
+from db.fsm_storage import PgStorage
+from db.instrumented_pool import InstrumentedPool
+from db.migrations import migrate
 from handlers import start, admin, group_guard
+from middlewares.lifecycle import InFlightMiddleware
+from middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware
+from middlewares.user import setup_user_middleware
+from services.ad_log import ad_log
+from services.blackouts import run_reload as run_blackout_reload
+from services.cooldown import cooldown
+from services.delete_queue import delete_queue
+from services.duplicates import duplicate_index
+from services.flood import flood_limiter
+from services.groups import group_registry
+from services.lifecycle import lifecycle
+from services.message_expiry import message_expiry
+from services.metrics import Gauge, registry, start_metrics_server
+from services.reminders import expiry_reminders
+from services.sender import sender
+from services.update_isolation import OrderedIsolation, update_isolation
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,11 +39,128 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def create_tables(pool: asyncpg.Pool):
-    async with pool.acquire() as conn:
-        for sql in ALL_TABLES:
-            await conn.execute(sql)
-    logger.info("Database tables ensured.")
+def setup_metrics(dp: Dispatcher, bot: Bot):
+    """Time every handler and Bot API call; expose service state as gauges."""
+    for event_name, observer in dp.observers.items():
+        if event_name not in ("update", "error"):
+            observer.middleware(HandlerMetricsMiddleware(event_name))
+    bot.session.middleware(ApiMetricsMiddleware())
+
+    registry.register(Gauge(
+        "bot_auth_cache_hits_total", "Auth cache hits.", lambda: auth_cache.hits, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_auth_cache_misses_total", "Auth cache misses.", lambda: auth_cache.misses, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_flood_tracked_users", "Users tracked by the flood limiter.", lambda: len(flood_limiter),
+    ))
+    registry.register(Gauge(
+        "bot_delete_queue_pending", "Messages waiting to be deleted.", lambda: len(delete_queue),
+    ))
+    registry.register(Gauge(
+        "bot_deleted_messages_total", "Messages deleted.", lambda: delete_queue.deleted, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_delete_failures_total", "Messages that could not be deleted.",
+        lambda: delete_queue.failed, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_expiring_messages", "Bot messages scheduled for deletion.", lambda: len(message_expiry),
+    ))
+    registry.register(Gauge(
+        "bot_send_queue_depth", "Outbound messages waiting, by priority.",
+        sender.queue_depth, label="priority",
+    ))
+    registry.register(Gauge(
+        "bot_sent_messages_total", "Outbound messages delivered.", lambda: sender.sent, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_send_failures_total", "Outbound messages given up on.", lambda: sender.failed, type="counter",
+    ))
+    registry.register(Gauge(
+        "bot_updates_in_flight", "Updates being handled.", lambda: lifecycle.inflight,
+    ))
+    isolation = dp.fsm.events_isolation
+    if isinstance(isolation, OrderedIsolation):
+        registry.register(Gauge(
+            "bot_update_queue_length", "Updates waiting for their chat or a free slot.",
+            lambda: isolation.waiting,
+        ))
+    registry.register(Gauge(
+        "bot_duplicate_index_entries", "Recent ads in the duplicate index.",
+        lambda: len(duplicate_index),
+    ))
+    registry.register(Gauge(
+        "bot_ad_log_pending", "Ad log records waiting to be written.", lambda: len(ad_log),
+    ))
+
+
+def create_dispatcher(bot: Bot) -> Dispatcher:
+    """The Dispatcher with its storage, routers and middlewares (also used by the bench)."""
+    # FSM state lives in Postgres so admin flows survive restarts and can
+    # be served by any worker. The event isolation bounds concurrency and
+    # keeps each chat's updates in order
+    storage = PgStorage(state_ttl=settings.FSM_STATE_TTL, cache_ttl=settings.FSM_CACHE_TTL)
+    dp = Dispatcher(storage=storage, events_isolation=update_isolation())
+
+    # Register routers (order matters — more specific first)
+    dp.include_router(start.router)
+    dp.include_router(admin.router)
+    dp.include_router(group_guard.router)
+    # Updates being handled are counted so shutdown can wait for them
+    dp.update.outer_middleware(InFlightMiddleware(lifecycle))
+    # Acting user + role loaded once per private update for the handlers
+    setup_user_middleware(dp)
+    setup_metrics(dp, bot)
+    return dp
+
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    # getUpdates is refused while a webhook is set
+    await bot.delete_webhook()
+
+    # Signals and the session close are left to the shutdown sequence
+    await dp.start_polling(
+        bot,
+        allowed_updates=dp.resolve_used_update_types(),
+        handle_signals=False,
+        close_bot_session=False,
+    )
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Serve updates over HTTPS webhook into the same Dispatcher.
+
+    Several instances can run behind a load balancer; each (re)registers
+    the same webhook URL on startup.
+    """
+    await bot.set_webhook(
+        url=settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBAPP_HOST, settings.WEBAPP_PORT)
+    await site.start()
+    logger.info(
+        "Webhook server listening on %s:%s%s",
+        settings.WEBAPP_HOST, settings.WEBAPP_PORT, settings.WEBHOOK_PATH,
+    )
+    try:
+        await asyncio.Event().wait()  # serve until cancelled
+    finally:
+        await runner.cleanup()
 
 
 async def main():
@@ -33,22 +170,71 @@ async def main():
     )
 
     pool = await asyncpg.create_pool(settings.DATABASE_URL)
-    await queries.set_pool(pool)
-    await create_tables(pool)
+    # Queries go through the timing wrapper; migrations use the raw pool
+    await queries.set_pool(InstrumentedPool(pool))
+    version = await migrate(pool)
+    logger.info("Database schema at version %d.", version)
+    await group_registry.load()
+    await queries.reload_blackouts()
+    await cooldown.load()
+    await duplicate_index.load()
+    await message_expiry.load()
 
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = create_dispatcher(bot)
+    storage = dp.fsm.storage
+    isolation = dp.fsm.events_isolation
 
-    # Register routers (order matters — more specific first)
-    dp.include_router(start.router)
-    dp.include_router(admin.router)
-    dp.include_router(group_guard.router)
+    # Background workers: group list reload and admin roster refresh,
+    # blackout reload, bulk deletion, outbound sends, warning expiry, FSM
+    # expiry, subscription reminders, ad log and last_ad_at writes
+    lifecycle.start_worker(
+        "rosters",
+        group_registry.run_rosters(
+            bot, settings.ADMIN_ROSTER_REFRESH, settings.GROUPS_RELOAD_INTERVAL
+        ),
+    )
+    lifecycle.start_worker("blackouts", run_blackout_reload(settings.BLACKOUT_RELOAD_INTERVAL))
+    lifecycle.start_worker("delete_queue", delete_queue.run(bot))
+    lifecycle.start_worker("sender", sender.run(bot))
+    lifecycle.start_worker("message_expiry", message_expiry.run())
+    lifecycle.start_worker("fsm_cleanup", storage.run_cleanup(settings.FSM_CLEANUP_INTERVAL))
+    lifecycle.start_worker("reminders", expiry_reminders.run())
+    lifecycle.start_worker("ad_log", ad_log.run())
+    lifecycle.start_worker("cooldown", cooldown.run())
+
+    # Shutdown: after running handlers, let queued updates run, pending
+    # albums be checked and queued messages go out while the sender still
+    # runs; then write what is buffered and close the pool and session last
+    if isinstance(isolation, OrderedIsolation):
+        lifecycle.add_drain("queued updates", isolation.drain)
+    lifecycle.add_drain("album batches", group_guard.drain_albums)
+    lifecycle.add_drain("outbound messages", sender.drain)
+    lifecycle.add_closer("delete queue", lambda: delete_queue.flush(bot))
+    lifecycle.add_closer("pending deletions", message_expiry.flush)
+    lifecycle.add_closer("ad log", ad_log.flush)
+    lifecycle.add_closer("last_ad_at writes", cooldown.flush)
+    lifecycle.add_closer("database pool", pool.close, on_timeout=pool.terminate)
+    lifecycle.add_closer("bot session", bot.session.close)
+
+    # Metrics get their own listener in both modes, never the public webhook server
+    if settings.METRICS_PORT:
+        metrics_runner = await start_metrics_server(
+            settings.METRICS_HOST, settings.METRICS_PORT, settings.METRICS_PATH
+        )
+        lifecycle.add_closer("metrics server", metrics_runner.cleanup)
+    lifecycle.install_signal_handlers()
 
-    logger.info("Bot starting...")
+    logger.info("Bot starting in %s mode...", settings.RUN_MODE)
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if settings.RUN_MODE == "webhook":
+            # Cancelling the server stops the site (updates already accepted
+            # are handled in background tasks and counted as in flight); the
+            # request handler closes the session, which reopens on demand
+            await lifecycle.serve(run_webhook(dp, bot))
+        else:
+            await lifecycle.serve(run_polling(dp, bot), stop_intake=dp.stop_polling)
     finally:
-        await pool.close()
-        await bot.session.close()
+        await lifecycle.shutdown()
         logger.info("Bot stopped.")
 
 
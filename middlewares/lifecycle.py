@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.lifecycle import Lifecycle
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Outer update middleware: count updates being handled.
+
+    Shutdown waits for this count to drop to zero before it closes the
+    pool and the bot session under the handlers.
+    """
+
+    def __init__(self, lifecycle: Lifecycle):
+        self.lifecycle = lifecycle
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        with self.lifecycle.handling():
+            return await handler(event, data)
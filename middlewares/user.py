@@ -0,0 +1,43 @@
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.enums import ChatType
+from aiogram.types import Chat, TelegramObject, User
+
+from config import settings
+from db import queries
+
+
+class UserMiddleware(BaseMiddleware):
+    """Outer middleware: load the acting user once per update.
+
+    Injects ``db_user`` (UserProfile or None) and ``role`` (None for
+    unregistered users; "superadmin" for the .env superadmin even without a
+    DB row) into handler data. Group chat events are passed through
+    untouched — the group guard has its own lookup via the auth cache.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        from_user: Optional[User] = data.get("event_from_user")
+        chat: Optional[Chat] = data.get("event_chat")
+        if from_user is None or (chat is not None and chat.type != ChatType.PRIVATE):
+            return await handler(event, data)
+
+        user = await queries.get_user(from_user.id)
+        data["db_user"] = user
+        if from_user.id == settings.SUPERADMIN_ID:
+            data["role"] = "superadmin"
+        else:
+            data["role"] = user.role if user else None
+        return await handler(event, data)
+
+
+def setup_user_middleware(dp: Dispatcher):
+    middleware = UserMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.outer_middleware(middleware)
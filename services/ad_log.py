@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from aiogram.types import Message
+
+from config import settings
+from db import queries
+from services.duplicates import Fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Column order of the tuples handed to queries.insert_ads
+AD_COLUMNS = (
+    "user_id", "chat_id", "message_ids", "media_file_ids", "text",
+    "status", "reason", "created_at", "sent_at", "text_simhash", "media_unique_ids",
+)
+
+
+def media_file_ids(message: Message) -> list[str]:
+    """file_ids of the media attached to one message (largest photo size)."""
+    if message.photo:
+        return [message.photo[-1].file_id]
+    media = (
+        message.video or message.animation or message.document
+        or message.audio or message.voice or message.video_note
+    )
+    return [media.file_id] if media else []
+
+
+class AdLogWriter:
+    """In-process queue of group posts, written to ``ads`` in batches.
+
+    The guard only appends a tuple; a background task flushes the buffer
+    with one COPY every ``flush_interval`` seconds, or sooner once
+    ``batch_size`` records are waiting. If the database is unavailable the
+    buffer is capped at ``max_pending`` and the oldest records dropped.
+    """
+
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: list[tuple] = []
+        self._wakeup = asyncio.Event()
+        self.written = 0
+        self.dropped = 0
+
+    def add_post(
+        self,
+        messages: list[Message],
+        decision: str,
+        allowed: bool,
+        fingerprint: Optional[Fingerprint] = None,
+    ):
+        """Queue one post (a single message or all parts of an album).
+
+        ``fingerprint`` is stored for posts added to the duplicate index,
+        which is rebuilt from it at startup.
+        """
+        first = messages[0]
+        text: Optional[str] = next(
+            (m.text or m.caption for m in messages if m.text or m.caption), None
+        )
+        self._pending.append((
+            first.from_user.id,
+            first.chat.id,
+            [m.message_id for m in messages],
+            json.dumps([fid for m in messages for fid in media_file_ids(m)]),
+            text,
+            "approved" if allowed else "rejected",
+            decision,
+            first.date,
+            first.date if allowed else None,
+            fingerprint.db_simhash if fingerprint else None,
+            (list(fingerprint.media) or None) if fingerprint else None,
+        ))
+        if len(self._pending) > self.max_pending:
+            overflow = len(self._pending) - self.max_pending
+            del self._pending[:overflow]
+            self.dropped += overflow
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def run(self):
+        """Flush forever; meant to run as a background task."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ad log flush failed; will retry")
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await queries.insert_ads(batch, AD_COLUMNS)
+        except BaseException:
+            # Put the batch back in front of anything queued meanwhile
+            self._pending[:0] = batch
+            raise
+        self.written += len(batch)
+
+    def stats(self) -> dict:
+        return {"pending": len(self), "written": self.written, "dropped": self.dropped}
+
+
+ad_log = AdLogWriter(
+    flush_interval=settings.AD_LOG_FLUSH_INTERVAL,
+    batch_size=settings.AD_LOG_BATCH_SIZE,
+    max_pending=settings.AD_LOG_MAX_PENDING,
+)
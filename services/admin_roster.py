@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.enums import ChatMemberStatus
+
+ADMIN_STATUSES = {ChatMemberStatus.CREATOR, ChatMemberStatus.ADMINISTRATOR}
+
+
+class AdminRoster:
+    """Locally held creator/administrator IDs of one chat.
+
+    Refreshed from ``get_chat_administrators`` on a schedule and patched
+    immediately from ``chat_member`` / ``my_chat_member`` updates, so the
+    group guard can authorize admins without any API call.
+    """
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self._ids: set[int] = set()
+        self.loaded = False
+        self.refreshed_at: Optional[datetime] = None
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def refresh(self, bot: Bot):
+        admins = await bot.get_chat_administrators(chat_id=self.chat_id)
+        # Swap the whole set at once — readers never see a half-built roster
+        self._ids = {m.user.id for m in admins if m.status in ADMIN_STATUSES}
+        self.loaded = True
+        self.refreshed_at = datetime.now(timezone.utc)
+
+    def apply(self, user_id: int, status: str):
+        """Apply a single membership change from a chat_member update."""
+        if status in ADMIN_STATUSES:
+            self._ids.add(user_id)
+        else:
+            self._ids.discard(user_id)
@@ -0,0 +1,23 @@
+import asyncio
+import logging
+
+from db import queries
+
+logger = logging.getLogger(__name__)
+
+
+async def run_reload(interval: float):
+    """Re-read blackouts forever; meant to run as a background task.
+
+    Adding or deleting a blackout rebuilds the index of the worker that
+    handled it right away; this brings every other worker up to date
+    within ``interval`` seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await queries.reload_blackouts()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Blackout reload failed; will retry")
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import settings
+from db import queries
+from services.groups import group_registry
+
+logger = logging.getLogger(__name__)
+
+
+class CooldownTracker:
+    """Enforces the minimum gap between a client's posts in each group from memory.
+
+    Holds the last allowed post time per (group, user) (seeded from
+    ``group_last_ads`` at startup) and persists changes with one bulk
+    upsert every ``flush_interval`` seconds instead of a write per post;
+    ``users.last_ad_at`` gets each user's latest post in the same flush.
+    After each flush ``group_last_ads`` is read back and merged, so posts
+    allowed by other workers count here within about two flush intervals.
+    Entries older than the longest group cooldown are dropped on flush — a
+    missing entry simply means "may post".
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._last: dict[tuple[int, int], datetime] = {}
+        self._dirty: dict[tuple[int, int], datetime] = {}
+
+    async def load(self):
+        """Merge in the posts recorded in ``group_last_ads`` (by any worker)."""
+        since = datetime.now(timezone.utc) - group_registry.max_cooldown()
+        for chat_id, user_id, at in await queries.get_recent_group_ad_times(since):
+            last = self._last.get((chat_id, user_id))
+            if last is None or at > last:
+                self._last[(chat_id, user_id)] = at
+
+    def next_allowed(self, chat_id: int, user_id: int, now: datetime) -> Optional[datetime]:
+        """When the user may post in the group again, or None if they may post now."""
+        last = self._last.get((chat_id, user_id))
+        if last is None:
+            return None
+        allowed_at = last + group_registry.cooldown(chat_id)
+        return allowed_at if allowed_at > now else None
+
+    def mark(self, chat_id: int, user_id: int, at: datetime):
+        self._last[(chat_id, user_id)] = at
+        self._dirty[(chat_id, user_id)] = at
+
+    async def flush(self):
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            latest: dict[int, datetime] = {}
+            for (_, user_id), at in dirty.items():
+                if user_id not in latest or at > latest[user_id]:
+                    latest[user_id] = at
+            try:
+                await queries.upsert_group_last_ads(
+                    [chat_id for chat_id, _ in dirty],
+                    [user_id for _, user_id in dirty],
+                    list(dirty.values()),
+                )
+                await queries.update_last_ads(list(latest), list(latest.values()))
+            except BaseException:
+                # Keep newer marks made meanwhile, restore the rest
+                self._dirty = {**dirty, **self._dirty}
+                raise
+
+        cutoff = datetime.now(timezone.utc) - group_registry.max_cooldown()
+        self._last = {key: at for key, at in self._last.items() if at > cutoff}
+
+    async def run(self):
+        """Flush forever; meant to run as a background task."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("last_ad_at flush or reload failed; will retry")
+
+
+cooldown = CooldownTracker(flush_interval=settings.LAST_AD_FLUSH_INTERVAL)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Telegram's deleteMessages accepts at most 100 IDs per call
+MAX_BATCH = 100
+
+
+class DeleteQueue:
+    """Background pipeline that bulk-deletes messages.
+
+    Message IDs are accumulated per chat and flushed through
+    ``deleteMessages`` every ``flush_interval`` seconds, or as soon as a
+    chat has a full batch. Flood-wait (``RetryAfter``) is honoured and the
+    batch retried.
+    """
+
+    def __init__(self, flush_interval: float, max_retries: int = 3):
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._pending: dict[int, list[int]] = {}
+        self._wakeup = asyncio.Event()
+        self.deleted = 0
+        self.failed = 0
+
+    def add(self, chat_id: int, message_ids: list[int]):
+        ids = self._pending.setdefault(chat_id, [])
+        ids.extend(message_ids)
+        if len(ids) >= MAX_BATCH:
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    async def run(self, bot: Bot):
+        """Flush forever; meant to run as a background task."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush(bot)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Delete queue flush failed")
+
+    async def flush(self, bot: Bot):
+        pending, self._pending = self._pending, {}
+        try:
+            for chat_id, ids in pending.items():
+                while ids:
+                    await self._delete_batch(bot, chat_id, ids[:MAX_BATCH])
+                    del ids[:MAX_BATCH]
+        except BaseException:
+            # Interrupted (e.g. cancelled at shutdown during a flood wait):
+            # put back what wasn't sent, ahead of IDs added meanwhile
+            for chat_id, ids in self._pending.items():
+                pending.setdefault(chat_id, []).extend(ids)
+            self._pending = {chat_id: ids for chat_id, ids in pending.items() if ids}
+            raise
+
+    async def _delete_batch(self, bot: Bot, chat_id: int, message_ids: list[int]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+                self.deleted += len(message_ids)
+                return
+            except TelegramRetryAfter as e:
+                logger.warning("deleteMessages flood wait: %ss", e.retry_after)
+                # Only wait if another attempt follows
+                if attempt < self.max_retries:
+                    await asyncio.sleep(e.retry_after)
+            except TelegramAPIError as e:
+                # e.g. the bot lost its 'Delete messages' permission
+                logger.warning("deleteMessages failed in %s: %s", chat_id, e)
+                break
+        self.failed += len(message_ids)
+
+    def stats(self) -> dict:
+        return {"pending": len(self), "deleted": self.deleted, "failed": self.failed}
+
+
+delete_queue = DeleteQueue(flush_interval=settings.DELETE_FLUSH_INTERVAL)
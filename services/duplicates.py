@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import re
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram.types import Message
+
+from config import settings
+from db import queries
+
+logger = logging.getLogger(__name__)
+
+# SimHash: 64 bits, split into BANDS bands for the LSH buckets. Two hashes
+# at most BANDS - 1 bits apart always share at least one whole band, so
+# looking up each band finds every near-duplicate within that distance.
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+# Shorter texts ("Sotiladi", a phone number) are too generic to compare
+MIN_WORDS = 6
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of the normalized text (word bigrams), or None if too short."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    features = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    # One bit string per feature; each column of the zipped strings is one
+    # bit position, and the majority vote per column gives the hash
+    bits = [
+        f"{int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), 'big'):064b}"
+        for f in features
+    ]
+    half = len(bits) / 2
+    value = 0
+    for column in zip(*bits):
+        value = (value << 1) | (column.count("1") > half)
+    return value
+
+
+def media_unique_ids(message: Message) -> list[str]:
+    """file_unique_ids of the media attached to one message (same for every re-upload)."""
+    if message.photo:
+        return [message.photo[-1].file_unique_id]
+    media = (
+        message.video or message.animation or message.document
+        or message.audio or message.voice or message.video_note
+    )
+    return [media.file_unique_id] if media else []
+
+
+class Fingerprint:
+    """What identifies an ad: text SimHash (None if too short) and media."""
+    __slots__ = ("simhash", "media")
+
+    def __init__(self, simhash: Optional[int], media: tuple[str, ...]):
+        self.simhash = simhash
+        self.media = media
+
+    @classmethod
+    def of(cls, messages: list[Message]) -> "Fingerprint":
+        """Fingerprint of a post (a single message or all parts of an album)."""
+        text = next((m.text or m.caption for m in messages if m.text or m.caption), None)
+        media = tuple(uid for m in messages for uid in media_unique_ids(m))
+        return cls(simhash(text) if text else None, media)
+
+    def __bool__(self) -> bool:
+        return self.simhash is not None or bool(self.media)
+
+    @property
+    def db_simhash(self) -> Optional[int]:
+        """The hash as a signed BIGINT."""
+        if self.simhash is None:
+            return None
+        return self.simhash - (1 << HASH_BITS) if self.simhash >> (HASH_BITS - 1) else self.simhash
+
+    @staticmethod
+    def from_db_simhash(value: Optional[int]) -> Optional[int]:
+        return None if value is None else value & ((1 << HASH_BITS) - 1)
+
+
+class _Entry:
+    __slots__ = ("chat_id", "user_id", "fingerprint", "at")
+
+    def __init__(self, chat_id: int, user_id: int, fingerprint: Fingerprint, at: datetime):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.fingerprint = fingerprint
+        self.at = at
+
+
+class DuplicateIndex:
+    """In-memory near-duplicate index of the allowed ads of the last ``window``.
+
+    Posts are looked up per group by media ``file_unique_id`` (exact) and
+    by text SimHash through LSH band buckets, so a check touches only the
+    few entries sharing a bucket instead of scanning ``ads``. Entries are
+    kept in time order and evicted from the front once older than the
+    window. At startup the index is rebuilt from the fingerprints stored
+    with the ad log.
+    """
+
+    def __init__(self, window: timedelta, max_distance: int):
+        self.window = window
+        # Beyond BANDS - 1 the band lookup could miss matches
+        self.max_distance = min(max_distance, BANDS - 1)
+        self._entries: deque[_Entry] = deque()
+        self._bands: dict[tuple[int, int, int], list[_Entry]] = {}   # (chat_id, band, value)
+        self._media: dict[tuple[int, str], list[_Entry]] = {}        # (chat_id, file_unique_id)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > timedelta(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def load(self):
+        if not self.enabled:
+            return
+        since = datetime.now(timezone.utc) - self.window
+        rows = await queries.get_recent_ad_fingerprints(since)
+        self._entries.clear()
+        self._bands.clear()
+        self._media.clear()
+        for chat_id, user_id, db_simhash, media, at in rows:
+            fingerprint = Fingerprint(Fingerprint.from_db_simhash(db_simhash), tuple(media or ()))
+            self.add(chat_id, user_id, fingerprint, at)
+
+    def find(self, chat_id: int, fingerprint: Fingerprint, now: datetime) -> Optional[_Entry]:
+        """An earlier post in the group that this one repeats, if any."""
+        self._evict(now)
+        for uid in fingerprint.media:
+            bucket = self._media.get((chat_id, uid))
+            if bucket:
+                return bucket[0]
+        if fingerprint.simhash is not None:
+            for key in self._band_keys(chat_id, fingerprint.simhash):
+                for entry in self._bands.get(key, ()):
+                    if (entry.fingerprint.simhash ^ fingerprint.simhash).bit_count() <= self.max_distance:
+                        return entry
+        return None
+
+    def add(self, chat_id: int, user_id: int, fingerprint: Fingerprint, at: datetime):
+        entry = _Entry(chat_id, user_id, fingerprint, at)
+        self._entries.append(entry)
+        for uid in fingerprint.media:
+            self._media.setdefault((chat_id, uid), []).append(entry)
+        if fingerprint.simhash is not None:
+            for key in self._band_keys(chat_id, fingerprint.simhash):
+                self._bands.setdefault(key, []).append(entry)
+
+    def _evict(self, now: datetime):
+        cutoff = now - self.window
+        while self._entries and self._entries[0].at <= cutoff:
+            entry = self._entries.popleft()
+            for uid in entry.fingerprint.media:
+                self._discard(self._media, (entry.chat_id, uid), entry)
+            if entry.fingerprint.simhash is not None:
+                for key in self._band_keys(entry.chat_id, entry.fingerprint.simhash):
+                    self._discard(self._bands, key, entry)
+
+    @staticmethod
+    def _band_keys(chat_id: int, value: int) -> list[tuple[int, int, int]]:
+        return [(chat_id, band, (value >> (band * BAND_BITS)) & _BAND_MASK) for band in range(BANDS)]
+
+    @staticmethod
+    def _discard(buckets: dict, key, entry: _Entry):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.remove(entry)
+            if not bucket:
+                del buckets[key]
+
+
+duplicate_index = DuplicateIndex(
+    window=timedelta(hours=settings.DUPLICATE_WINDOW_HOURS),
+    max_distance=settings.DUPLICATE_MAX_DISTANCE,
+)
@@ -0,0 +1,66 @@
+from array import array
+from collections import OrderedDict
+
+from config import settings
+
+
+class _Window:
+    __slots__ = ("times", "pos", "over")
+
+    def __init__(self, limit: int):
+        self.times = array("d", [float("-inf")] * limit)  # ring of the last ``limit`` posts
+        self.pos = 0    # oldest entry, overwritten next
+        self.over = 0   # posts over the limit in the current flood
+
+
+class FloodLimiter:
+    """Per-user, per-group sliding-window post rate limit, held in memory.
+
+    Each tracked (chat, user) keeps a ring buffer of its last ``limit``
+    post times, so a post is over the limit exactly when the oldest of
+    them is less than ``window`` seconds old. Memory per user is fixed;
+    at most ``max_tracked`` users are kept, least recently active evicted
+    first. Posts over the limit are recorded too, so a sustained flood
+    stays limited until it pauses.
+    """
+
+    def __init__(self, limit: int, window: float, max_tracked: int):
+        self.limit = limit
+        self.window = window
+        self.max_tracked = max_tracked
+        self._windows: OrderedDict[tuple[int, int], _Window] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def hit(self, chat_id: int, user_id: int, now: float) -> int:
+        """Record a post at monotonic ``now``.
+
+        Returns how many posts of the current flood are over the limit
+        (1 for the first one), or 0 if this post is within the limit.
+        """
+        key = (chat_id, user_id)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(self.limit)
+            if len(self._windows) > self.max_tracked:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(key)
+
+        flooding = window.times[window.pos] > now - self.window
+        window.times[window.pos] = now
+        window.pos = (window.pos + 1) % self.limit
+        window.over = window.over + 1 if flooding else 0
+        return window.over
+
+
+flood_limiter = FloodLimiter(
+    limit=settings.FLOOD_LIMIT,
+    window=settings.FLOOD_WINDOW,
+    max_tracked=settings.FLOOD_TRACKED_USERS,
+)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Union
+
+from aiogram import Bot
+from aiogram.filters import BaseFilter
+from aiogram.types import ChatMemberUpdated, Message
+
+from config import settings
+from db import queries
+from db.records import Group
+from services.admin_roster import AdminRoster
+
+logger = logging.getLogger(__name__)
+
+
+class GroupRegistry:
+    """The guarded groups, their settings and admin rosters, by chat_id.
+
+    Loaded from the ``groups`` table at startup and after every change, and
+    re-read periodically so changes made by other workers are picked up;
+    routing and per-group rule lookups are dict gets on the hot path.
+    """
+
+    def __init__(self, default_chat_id: int):
+        # The .env GROUP_ID — registered on first start, so a
+        # single-group setup keeps working without any admin action
+        self.default_chat_id = default_chat_id
+        self._groups: dict[int, Group] = {}
+        self._rosters: dict[int, AdminRoster] = {}
+        self._changed = asyncio.Event()
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._groups
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __iter__(self) -> Iterator[Group]:
+        return iter(list(self._groups.values()))
+
+    def get(self, chat_id: int) -> Optional[Group]:
+        return self._groups.get(chat_id)
+
+    def roster(self, chat_id: int) -> AdminRoster:
+        return self._rosters[chat_id]
+
+    def cooldown_hours(self, chat_id: int) -> float:
+        group = self._groups.get(chat_id)
+        if group is None or group.cooldown_hours is None:
+            return settings.COOLDOWN_HOURS
+        return group.cooldown_hours
+
+    def cooldown(self, chat_id: int) -> timedelta:
+        return timedelta(hours=self.cooldown_hours(chat_id))
+
+    def max_cooldown(self) -> timedelta:
+        hours = [self.cooldown_hours(chat_id) for chat_id in self._groups]
+        return timedelta(hours=max(hours, default=settings.COOLDOWN_HOURS))
+
+    async def load(self):
+        if await queries.seed_group(self.default_chat_id):
+            # Upgrading from a single group: its cooldowns lived in users.last_ad_at
+            since = datetime.now(timezone.utc) - timedelta(hours=settings.COOLDOWN_HOURS)
+            await queries.seed_group_last_ads(self.default_chat_id, since)
+        await self.reload()
+
+    async def reload(self):
+        """Re-read the groups table."""
+        groups = {g.chat_id: g for g in await queries.get_groups()}
+        # Keep the rosters of groups that stay — they're already loaded
+        rosters = {
+            chat_id: self._rosters.get(chat_id) or AdminRoster(chat_id) for chat_id in groups
+        }
+        self._groups, self._rosters = groups, rosters
+        self._changed.set()
+
+    async def add(
+        self, chat_id: int, title: Optional[str], cooldown_hours: Optional[float]
+    ) -> Group:
+        group = await queries.upsert_group(chat_id, title, cooldown_hours)
+        await self.load()
+        return group
+
+    async def remove(self, chat_id: int):
+        await queries.delete_group(chat_id)
+        await self.reload()
+
+    async def run_rosters(self, bot: Bot, interval: float, reload_interval: float):
+        """Refresh every group's admin roster forever; meant to run as a
+        background task. The group list is re-read every ``reload_interval``
+        seconds; newly added groups are refreshed right away.
+        """
+        due: dict[int, float] = {}  # chat_id -> monotonic time of next refresh
+        next_reload = time.monotonic() + reload_interval
+        while True:
+            if time.monotonic() >= next_reload:
+                next_reload = time.monotonic() + reload_interval
+                try:
+                    await self.reload()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Groups reload failed; keeping the current list")
+            self._changed.clear()
+            for chat_id, roster in list(self._rosters.items()):
+                if due.get(chat_id, 0) > time.monotonic():
+                    continue
+                due[chat_id] = time.monotonic() + interval
+                try:
+                    await roster.refresh(bot)
+                    logger.info("Admin roster for %s refreshed: %d admins.", chat_id, len(roster))
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Admin roster refresh failed for %s", chat_id)
+            due = {chat_id: at for chat_id, at in due.items() if chat_id in self._rosters}
+            wake = min([next_reload, *due.values()])
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(wake - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+class GuardedGroup(BaseFilter):
+    """Passes messages and member updates from registered groups."""
+
+    async def __call__(self, event: Union[Message, ChatMemberUpdated]) -> bool:
+        return event.chat.id in group_registry
+
+
+group_registry = GroupRegistry(settings.GROUP_ID)
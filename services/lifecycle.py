@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import signal
+import time
+from contextlib import contextmanager, suppress
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Closers (final flushes, pool, session) get at least this long even when
+# the drain used up the whole deadline, so buffered writes still get a try
+MIN_CLOSE_TIMEOUT = 2.0  # seconds
+
+
+class Lifecycle:
+    """Graceful shutdown: stop taking updates, drain, then tear down.
+
+    On SIGINT/SIGTERM ``serve`` stops update intake. ``shutdown`` then waits,
+    all within ``timeout`` seconds, for updates still being handled
+    (counted by ``InFlightMiddleware``) and for the registered drain steps
+    (album batches, queued sends). After that it stops the background
+    workers and runs the closers in order: final flushes of the write-behind
+    buffers, then the DB pool and the bot session. The time it took is logged.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.stopping = asyncio.Event()
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: dict[str, asyncio.Task] = {}
+        self._drains: list[tuple[str, Callable[[], Awaitable]]] = []
+        self._closers: list[tuple[str, Callable[[], Awaitable], Optional[Callable[[], None]]]] = []
+
+    # ─── Registration ─────────────────────────────────────────────────
+
+    def start_worker(self, name: str, coro: Awaitable) -> asyncio.Task:
+        """Run a background worker until shutdown."""
+        task = asyncio.create_task(coro, name=name)
+        self._workers[name] = task
+        return task
+
+    def add_drain(self, name: str, drain: Callable[[], Awaitable]):
+        """Wait for ``drain()`` (within the deadline) before workers are stopped."""
+        self._drains.append((name, drain))
+
+    def add_closer(
+        self,
+        name: str,
+        close: Callable[[], Awaitable],
+        on_timeout: Optional[Callable[[], None]] = None,
+    ):
+        """Run ``close()`` after the workers are stopped, in registration order."""
+        self._closers.append((name, close, on_timeout))
+
+    # ─── In-flight updates ────────────────────────────────────────────
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @contextmanager
+    def handling(self):
+        """Count one update as in flight for the duration of the block."""
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    # ─── Running ──────────────────────────────────────────────────────
+
+    def install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):  # not supported on Windows
+                loop.add_signal_handler(sig, self._on_signal, sig)
+
+    def _on_signal(self, sig: signal.Signals):
+        logger.info("Received %s, shutting down...", sig.name)
+        self.stopping.set()
+
+    async def serve(
+        self,
+        server: Awaitable,
+        stop_intake: Optional[Callable[[], Awaitable]] = None,
+    ):
+        """Run ``server`` until it returns or a stop signal arrives.
+
+        On a signal, ``stop_intake()`` is awaited to make the server stop
+        taking updates and return; without one the server is cancelled.
+        """
+        server_task = asyncio.create_task(server)
+        stop_task = asyncio.create_task(self.stopping.wait())
+        try:
+            await asyncio.wait({server_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop_task.cancel()
+            if not server_task.done():
+                try:
+                    if stop_intake is None:
+                        raise NotImplementedError
+                    await stop_intake()
+                except Exception:
+                    # No graceful stop (or e.g. polling not started yet)
+                    server_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await server_task
+
+    async def shutdown(self):
+        """Drain in-flight work within the deadline, then tear everything down."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        clean = True
+
+        # Updates being handled, then queued follow-up work
+        clean &= await self._bounded("handlers", self._idle.wait(), deadline)
+        for name, drain in self._drains:
+            clean &= await self._bounded(name, drain(), deadline)
+
+        # Workers are cancelled rather than awaited to completion; the
+        # closers below do their final flushes
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        if workers:
+            _, stuck = await asyncio.wait(workers, timeout=MIN_CLOSE_TIMEOUT)
+            for task in stuck:
+                logger.warning("Worker %s did not stop in time", task.get_name())
+
+        for name, close, on_timeout in self._closers:
+            timeout = max(deadline - time.monotonic(), MIN_CLOSE_TIMEOUT)
+            try:
+                await asyncio.wait_for(close(), timeout=timeout)
+            except asyncio.TimeoutError:
+                clean = False
+                logger.warning("Shutdown: %s timed out after %.1fs", name, timeout)
+                if on_timeout is not None:
+                    on_timeout()
+            except Exception:
+                clean = False
+                logger.exception("Shutdown: %s failed", name)
+
+        elapsed = time.monotonic() - started
+        if clean:
+            logger.info("Shutdown drained in %.2fs.", elapsed)
+        else:
+            logger.warning("Shutdown finished in %.2fs with work left undone.", elapsed)
+
+    async def _bounded(self, name: str, aw: Awaitable, deadline: float) -> bool:
+        try:
+            await asyncio.wait_for(aw, timeout=max(deadline - time.monotonic(), 0))
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Shutdown deadline reached while waiting for %s (%d updates in flight)",
+                name, self._inflight,
+            )
+            return False
+        except Exception:
+            logger.exception("Shutdown: draining %s failed", name)
+            return False
+
+
+lifecycle = Lifecycle(timeout=settings.SHUTDOWN_TIMEOUT)
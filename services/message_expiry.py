@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from config import settings
+from db import queries
+from services.delete_queue import delete_queue
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) scheduling, expiry one slot per tick.
+
+    An item due ``n`` ticks from now goes into slot ``(current + n) %
+    len(slots)`` with its absolute due tick. Advancing visits each elapsed
+    slot once and takes out only the items already due; those more than a
+    full revolution away stay for a later round.
+    """
+
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self._slots: list[list[tuple[int, Any]]] = [[] for _ in range(slots)]
+        self._origin = time.monotonic()
+        self._current = 0  # last tick processed
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, item: Any, delay: float, now: Optional[float] = None):
+        """Make ``item`` due ``delay`` seconds after monotonic ``now``."""
+        # From the clock, not the last processed tick: the wheel may not
+        # have been advanced for a while (e.g. between import and run())
+        elapsed = (time.monotonic() if now is None else now) - self._origin
+        due = max(self._current, int(elapsed / self.tick)) + max(1, math.ceil(delay / self.tick))
+        self._slots[due % len(self._slots)].append((due, item))
+        self._count += 1
+
+    def advance(self, now: float) -> list[Any]:
+        """Items due up to monotonic time ``now``, in due order per slot."""
+        target = int((now - self._origin) / self.tick)
+        # Nothing is ever more than one revolution behind: after a long
+        # stall visiting every slot once is enough
+        start = max(self._current + 1, target - len(self._slots) + 1)
+        expired: list[Any] = []
+        for tick in range(start, target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            keep = [(due, item) for due, item in slot if due > target]
+            if len(keep) != len(slot):
+                expired.extend(item for due, item in slot if due <= target)
+                self._slots[tick % len(self._slots)] = keep
+        self._current = max(self._current, target)
+        self._count -= len(expired)
+        return expired
+
+
+class MessageExpiry:
+    """Deletes bot messages (guard warnings) a while after they were sent.
+
+    Scheduled messages sit in one ``TimerWheel`` ticked by a single
+    background task; expired IDs go to the delete queue, which removes
+    them with bulk ``deleteMessages``. Each message is also recorded in
+    ``pending_deletions`` so a restart picks the schedule up again; those
+    writes are buffered and flushed every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, flush_interval: float, tick: float = 1.0, slots: int = 512):
+        self.flush_interval = flush_interval
+        self._wheel = TimerWheel(tick, slots)
+        # Not yet persisted (key -> delete_at) / expired but still in the table
+        self._new: dict[tuple[int, int], datetime] = {}
+        self._done: set[tuple[int, int]] = set()
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._wheel)
+
+    async def load(self):
+        now = datetime.now(timezone.utc)
+        for chat_id, message_id, delete_at in await queries.get_pending_deletions():
+            self._wheel.schedule((chat_id, message_id), (delete_at - now).total_seconds())
+
+    def schedule(self, chat_id: int, message_id: int, ttl: float):
+        delete_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        self._wheel.schedule((chat_id, message_id), ttl)
+        self._new[(chat_id, message_id)] = delete_at
+
+    def delete_later(self, sent: asyncio.Future, ttl: float):
+        """Schedule the message a sender future resolves to, once it is sent."""
+        def on_sent(future: asyncio.Future):
+            message = None if future.cancelled() else future.result()
+            if message is not None:
+                self.schedule(message.chat.id, message.message_id, ttl)
+
+        sent.add_done_callback(on_sent)
+
+    def expire(self, now: Optional[float] = None):
+        """Hand every message that is due to the delete queue."""
+        keys = self._wheel.advance(time.monotonic() if now is None else now)
+        by_chat: dict[int, list[int]] = {}
+        for key in keys:
+            by_chat.setdefault(key[0], []).append(key[1])
+            # Never written to the table? Then there's nothing to remove
+            if self._new.pop(key, None) is None:
+                self._done.add(key)
+        for chat_id, message_ids in by_chat.items():
+            delete_queue.add(chat_id, message_ids)
+        self.expired += len(keys)
+
+    async def flush(self):
+        new, self._new = self._new, {}
+        done, self._done = self._done, set()
+        try:
+            if new:
+                await queries.add_pending_deletions(
+                    [chat_id for chat_id, _ in new],
+                    [message_id for _, message_id in new],
+                    list(new.values()),
+                )
+            if done:
+                await queries.remove_pending_deletions(
+                    [chat_id for chat_id, _ in done],
+                    [message_id for _, message_id in done],
+                )
+        except BaseException:
+            # Inserts run before deletes, so restoring both stays consistent
+            self._new = {**new, **self._new}
+            self._done |= done
+            raise
+
+    async def run(self):
+        """Tick and flush forever; meant to run as a background task."""
+        last_flush = time.monotonic()
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            now = time.monotonic()
+            self.expire(now)
+            if now - last_flush < self.flush_interval:
+                continue
+            last_flush = now
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Pending deletions flush failed; will retry")
+
+    def stats(self) -> dict:
+        return {"scheduled": len(self), "expired": self.expired, "unsaved": len(self._new)}
+
+
+message_expiry = MessageExpiry(flush_interval=settings.WARNING_PERSIST_INTERVAL)
@@ -0,0 +1,146 @@
+"""Minimal in-process metrics with a Prometheus text exposition endpoint."""
+import math
+from bisect import bisect_left
+from typing import Callable, Union
+
+from aiohttp import web
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, count in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {count}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == math.inf else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from ``fn`` — a number, or {label value: number}.
+
+    Also used with ``type="counter"`` to expose totals a service already
+    keeps (e.g. ``sender.sent``) without double bookkeeping.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Union[float, dict]],
+        label: str = "",
+        type: str = "gauge",
+    ):
+        self.name, self.help, self.fn, self.label, self.type = name, help, fn, label, type
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, v in value.items():
+                lines.append(f"{self.name}{_labels((self.label,), (label_value,))} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_latency = registry.register(Histogram(
+    "bot_handler_seconds", "Handler latency by event type and handler.", ("event", "handler"),
+))
+handler_errors = registry.register(Counter(
+    "bot_handler_errors_total", "Handlers that raised, by event type and handler.", ("event", "handler"),
+))
+guard_outcomes = registry.register(Counter(
+    "bot_guard_posts_total", "Group posts by guard decision.", ("decision",),
+))
+query_latency = registry.register(Histogram(
+    "bot_db_query_seconds", "Database statement latency by query function.", ("query",),
+))
+pool_wait = registry.register(Histogram(
+    "bot_db_pool_wait_seconds", "Time spent waiting for a pooled connection.",
+))
+api_latency = registry.register(Histogram(
+    "bot_telegram_api_seconds", "Telegram Bot API call latency by method.", ("method",),
+))
+api_errors = registry.register(Counter(
+    "bot_telegram_api_errors_total", "Failed Telegram Bot API calls by method.", ("method",),
+))
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int, path: str = "/metrics") -> web.AppRunner:
+    """Serve metrics on their own listener, apart from the webhook server."""
+    app = web.Application()
+    app.router.add_get(path, handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from html import escape
+
+from config import settings
+from db import queries
+from db.cache import auth_cache
+from db.records import ExpiringSubscription, UserAuth
+from services.sender import Priority, sender
+
+logger = logging.getLogger(__name__)
+
+EXPIRED = "expired"
+
+
+class ExpiryReminders:
+    """Warns clients before (and when) their subscription lapses.
+
+    One query per tick finds every client inside a reminder window
+    (``days`` before expiry, plus "just expired"); unsent reminders are
+    claimed in one batch (so several workers don't both send one) and queued through the send scheduler at
+    notification priority. Clients expiring around this tick also get
+    their auth state put into the guard's cache, so the first post after
+    expiry doesn't go to the database.
+    """
+
+    def __init__(self, days: list[int], interval: float, expired_grace: float):
+        self.interval = interval
+        self.expired_grace = expired_grace
+        self.kinds = [f"{d}d" for d in days] + [EXPIRED]
+        self.leads = [d * 86_400.0 for d in days] + [0.0]
+        self.sent = 0
+
+    async def tick(self, now: datetime):
+        # Taken before the read, so a write-through during the query
+        # (e.g. /extend) keeps its fresh row in the cache
+        generation = auth_cache.generation
+        rows = await queries.get_expiring_subscriptions(
+            now, self.kinds, self.leads, self.expired_grace
+        )
+
+        prewarm_until = now + timedelta(seconds=self.interval)
+        for row in rows:
+            if row.subscription_until <= prewarm_until:
+                auth_cache.fill(
+                    row.telegram_id, UserAuth(row.role, row.subscription_until), generation
+                )
+
+        due = [row for row in rows if not row.reminded]
+        if not due:
+            return
+        # Claim first: a user who blocked the bot must not be retried every
+        # tick, and a reminder another worker claimed is theirs to send
+        claimed = await queries.claim_reminders(
+            [(row.telegram_id, row.subscription_until, row.kind) for row in due]
+        )
+        due = [row for row in due if (row.telegram_id, row.kind) in claimed]
+        if not due:
+            return
+        for row in due:
+            sender.submit(row.telegram_id, _reminder_text(row), Priority.NOTIFICATION, parse_mode="HTML")
+        self.sent += len(due)
+        logger.info("Queued %d subscription reminders.", len(due))
+
+    async def run(self):
+        """Tick forever; meant to run as a background task."""
+        while True:
+            try:
+                await self.tick(datetime.now(timezone.utc))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Subscription reminder tick failed")
+            await asyncio.sleep(self.interval)
+
+
+def _reminder_text(row: ExpiringSubscription) -> str:
+    name = escape(row.full_name or "")
+    if row.kind == EXPIRED:
+        return (
+            f"❌ Hurmatli {name}, obunangiz tugadi.\n"
+            "Guruhga reklama joylashda davom etish uchun @jondor_admin1 ga yozing."
+        )
+    until = row.subscription_until.strftime("%d.%m.%Y %H:%M")
+    return (
+        f"⏳ Hurmatli {name}, obunangiz <b>{until}</b> (UTC) da tugaydi.\n"
+        "Uzaytirish uchun @jondor_admin1 ga yozing."
+    )
+
+
+expiry_reminders = ExpiryReminders(
+    days=settings.REMINDER_DAYS,
+    interval=settings.REMINDER_CHECK_INTERVAL,
+    expired_grace=settings.REMINDER_EXPIRED_GRACE,
+)
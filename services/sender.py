@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from cachetools import TTLCache
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value is sent first."""
+    ADMIN = 0           # replies/alerts meant for admins
+    GROUP_WARNING = 1   # guard warnings posted in the group
+    NOTIFICATION = 2    # bulk notifications to users' private chats
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate            # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0    # set on RetryAfter
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ("chat_id", "text", "kwargs", "priority", "future", "attempts")
+
+    def __init__(self, chat_id: int, text: str, kwargs: dict, priority: Priority):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.attempts = 0
+
+
+class SendScheduler:
+    """Central, rate-limited outbound message queue.
+
+    Jobs are sent highest priority first, within a global token bucket and
+    one bucket per chat (Telegram: ~30 msg/s overall, ~20 msg/min per
+    group, ~1 msg/s per private chat). A job whose chat has no token left
+    is parked until it has one, so it doesn't hold back other chats.
+    ``RetryAfter`` blocks the chat's bucket and the job is retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        group_rate_per_minute: float,
+        private_rate: float,
+        max_retries: int = 3,
+    ):
+        self._global = TokenBucket(global_rate, capacity=global_rate)
+        self._group_rate = group_rate_per_minute / 60
+        self._private_rate = private_rate
+        # Idle chats' buckets are full again anyway, so they can be dropped
+        self._chats: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+        self.max_retries = max_retries
+
+        self._seq = itertools.count()
+        self._ready: list[tuple[int, int, _Job]] = []             # (priority, seq, job)
+        self._parked: list[tuple[float, int, int, _Job]] = []     # (ready_at, priority, seq, job)
+        self._wakeup = asyncio.Event()
+        self._inflight: set[asyncio.Task] = set()
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def submit(
+        self, chat_id: int, text: str, priority: Priority, **kwargs
+    ) -> asyncio.Future:
+        """Queue a send_message call.
+
+        The returned future resolves to the sent Message, or None if it
+        could not be delivered (e.g. the user blocked the bot) — callers
+        may ignore it.
+        """
+        job = _Job(chat_id, text, kwargs, priority)
+        heapq.heappush(self._ready, (priority, next(self._seq), job))
+        self._wakeup.set()
+        return job.future
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:  # groups/supergroups/channels
+                bucket = TokenBucket(self._group_rate, capacity=3)
+            else:
+                bucket = TokenBucket(self._private_rate, capacity=1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def run(self, bot: Bot):
+        """Dispatch forever; meant to run as a background task."""
+        while True:
+            now = time.monotonic()
+            while self._parked and self._parked[0][0] <= now:
+                _, priority, seq, job = heapq.heappop(self._parked)
+                heapq.heappush(self._ready, (priority, seq, job))
+
+            if not self._ready:
+                timeout = self._parked[0][0] - now if self._parked else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            priority, seq, job = heapq.heappop(self._ready)
+            chat_wait = self._bucket(job.chat_id).delay(now)
+            if chat_wait > 0:
+                heapq.heappush(self._parked, (now + chat_wait, priority, seq, job))
+                continue
+
+            global_wait = self._global.delay(now)
+            if global_wait > 0:
+                # Everyone shares the global limit — just wait for it
+                heapq.heappush(self._ready, (priority, seq, job))
+                await asyncio.sleep(global_wait)
+                continue
+
+            self._global.take()
+            self._bucket(job.chat_id).take()
+            task = asyncio.create_task(self._send(bot, job, seq))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, bot: Bot, job: _Job, seq: int):
+        job.attempts += 1
+        try:
+            message = await bot.send_message(chat_id=job.chat_id, text=job.text, **job.kwargs)
+        except TelegramRetryAfter as e:
+            if job.attempts <= self.max_retries:
+                self.retried += 1
+                ready_at = time.monotonic() + e.retry_after
+                self._bucket(job.chat_id).blocked_until = ready_at
+                heapq.heappush(self._parked, (ready_at, job.priority, seq, job))
+                self._wakeup.set()
+                return
+            self._fail(job, e)
+        except TelegramAPIError as e:
+            self._fail(job, e)
+        except Exception as e:
+            logger.exception("Unexpected error sending to %s", job.chat_id)
+            self._fail(job, e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(message)
+
+    def _fail(self, job: _Job, error: Exception):
+        self.failed += 1
+        logger.info("Message to %s not delivered: %s", job.chat_id, error)
+        if not job.future.done():
+            job.future.set_result(None)
+
+    def pending(self) -> int:
+        """Jobs not yet settled: queued, parked or being sent."""
+        return len(self._ready) + len(self._parked) + len(self._inflight)
+
+    async def drain(self, poll_interval: float = 0.05):
+        """Wait until every submitted job is sent or given up on.
+
+        ``run`` must still be running; used at shutdown under a deadline.
+        """
+        while self.pending():
+            await asyncio.sleep(poll_interval)
+
+    def queue_depth(self) -> dict[str, int]:
+        depth = {p.name: 0 for p in Priority}
+        for entry in self._ready:
+            depth[entry[2].priority.name] += 1
+        for entry in self._parked:
+            depth[entry[3].priority.name] += 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue_depth(),
+            "inflight": len(self._inflight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+sender = SendScheduler(
+    global_rate=settings.SEND_GLOBAL_RATE,
+    group_rate_per_minute=settings.SEND_GROUP_RATE_PER_MINUTE,
+    private_rate=settings.SEND_PRIVATE_RATE,
+)
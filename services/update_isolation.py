@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Hashable, Literal, Optional
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from config import settings
+
+
+class _KeyLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # holder + waiters; the entry is dropped at zero
+
+
+class OrderedIsolation(BaseEventIsolation):
+    """FSM event isolation: per-key ordering under a global concurrency cap.
+
+    aiogram's FSM middleware wraps every update that has a chat or user in
+    ``lock(key)``, before the state is read. Updates with the same key
+    run one at a time in arrival order (``asyncio.Lock`` wakes waiters
+    FIFO), so album parts and FSM steps are never reordered; different keys
+    run in parallel, at most ``limit`` at once. With ``order_by="user"``
+    the key is the (chat, user) pair — the FSM's own key — so posts of
+    different users in one busy group don't wait on each other; ``"chat"``
+    serializes whole chats. The key's slot is taken before a global one,
+    so a busy key doesn't tie up capacity other keys could use.
+    """
+
+    def __init__(self, limit: int, order_by: Literal["chat", "user"] = "user"):
+        self.order_by = order_by
+        self._semaphore = asyncio.Semaphore(limit)
+        self._keys: dict[Hashable, _KeyLock] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.waiting = 0
+        self.running = 0
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        order_key = key.chat_id if self.order_by == "chat" else (key.chat_id, key.user_id)
+        entry = self._keys.get(order_key)
+        if entry is None:
+            entry = self._keys[order_key] = _KeyLock()
+        entry.users += 1
+        self.waiting += 1
+        self._idle.clear()
+        started = False
+        try:
+            async with entry.lock, self._semaphore:
+                self.waiting -= 1
+                self.running += 1
+                started = True
+                try:
+                    yield
+                finally:
+                    self.running -= 1
+        finally:
+            if not started:
+                self.waiting -= 1
+            entry.users -= 1
+            if not entry.users:
+                del self._keys[order_key]
+            if not self.waiting and not self.running:
+                self._idle.set()
+
+    async def drain(self):
+        """Wait until no update is queued or running (used at shutdown)."""
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"waiting": self.waiting, "running": self.running, "keys": len(self._keys)}
+
+
+def update_isolation() -> Optional[OrderedIsolation]:
+    """Isolation configured by UPDATE_CONCURRENCY (None: aiogram's default)."""
+    if not settings.UPDATE_CONCURRENCY:
+        return None
+    return OrderedIsolation(settings.UPDATE_CONCURRENCY, settings.UPDATE_ORDER_KEY)
@@ -13,4 +13,9 @@ class AdminExtendStates(StatesGroup):
 
 class AdminBlackoutStates(StatesGroup):
     waiting_start = State()
-    waiting_end = State()
\ No newline at end of file
+    waiting_end = State()
+    waiting_group = State()
+
+
+class AdminSearchStates(StatesGroup):
+    waiting_query = State()
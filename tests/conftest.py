@@ -0,0 +1,10 @@
+import os
+import sys
+
+# config.Settings needs these at import time
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+os.environ.setdefault("SUPERADMIN_ID", "1")
+os.environ.setdefault("GROUP_ID", "-100")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,36 @@
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessages
+
+from services.delete_queue import DeleteQueue
+
+
+class _FloodedBot:
+    """Deletes in chat 1; chat 2 is in a long flood wait."""
+
+    def __init__(self):
+        self.deleted: list[tuple[int, int]] = []
+
+    async def delete_messages(self, chat_id: int, message_ids: list[int]):
+        if chat_id == 2:
+            raise TelegramRetryAfter(DeleteMessages(chat_id=chat_id, message_ids=message_ids), "", 60)
+        self.deleted.append((chat_id, len(message_ids)))
+
+
+def test_cancelled_flush_keeps_unsent_ids():
+    async def run():
+        queue = DeleteQueue(flush_interval=5)
+        queue.add(1, list(range(150)))
+        queue.add(2, list(range(120)))
+        bot = _FloodedBot()
+        flush = asyncio.create_task(queue.flush(bot))
+        await asyncio.sleep(0.05)  # now sleeping on chat 2's RetryAfter
+        queue.add(2, [999])
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return bot, queue
+
+    bot, queue = asyncio.run(run())
+    assert bot.deleted == [(1, 100), (1, 50)]
+    assert queue._pending == {2: list(range(120)) + [999]}
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timezone
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update, User
+
+from db import queries
+from db.fsm_storage import PgStorage
+
+
+def _feed(chat: Chat, user_ids: list[int], monkeypatch) -> list[str]:
+    """Feed one message per user through a Dispatcher on PgStorage; return the FSM queries."""
+    calls: list[str] = []
+
+    async def get_fsm_record(key):
+        calls.append(key)
+        return None
+
+    monkeypatch.setattr(queries, "get_fsm_record", get_fsm_record)
+
+    router = Router()
+
+    @router.message()
+    async def any_message(message: Message):
+        pass
+
+    async def run():
+        dp = Dispatcher(storage=PgStorage(state_ttl=60, cache_ttl=1.0))
+        dp.include_router(router)
+        bot = Bot("42:TEST")
+        now = datetime.now(timezone.utc)
+        for i, user_id in enumerate(user_ids, start=1):
+            user = User(id=user_id, is_bot=False, first_name="Test")
+            message = Message(message_id=i, date=now, chat=chat, from_user=user, text="ad")
+            await dp.feed_update(bot, Update(update_id=i, message=message))
+        await bot.session.close()
+
+    asyncio.run(run())
+    return calls
+
+
+def test_group_posts_do_not_touch_fsm_storage(monkeypatch):
+    group = Chat(id=-100, type="supergroup", title="group")
+    assert _feed(group, list(range(1000, 1050)), monkeypatch) == []
+
+
+def test_private_messages_read_fsm_storage(monkeypatch):
+    calls = _feed(Chat(id=1000, type="private"), [1000], monkeypatch)
+    assert len(calls) == 1
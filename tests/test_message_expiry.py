@@ -0,0 +1,22 @@
+from services.message_expiry import TimerWheel
+
+
+def test_schedule_counts_from_now_not_last_tick():
+    wheel = TimerWheel(tick=1.0, slots=8)
+    # Nothing advanced the wheel since it was created 100 s ago
+    now = wheel._origin + 100
+    wheel.schedule("warning", 5, now=now)
+
+    assert wheel.advance(now + 4) == []
+    assert wheel.advance(now + 5) == ["warning"]
+    assert len(wheel) == 0
+
+
+def test_schedule_beyond_one_revolution():
+    wheel = TimerWheel(tick=1.0, slots=8)
+    now = wheel._origin + 3
+    wheel.advance(now)
+    wheel.schedule("warning", 20, now=now)
+
+    assert wheel.advance(now + 19) == []
+    assert wheel.advance(now + 20) == ["warning"]
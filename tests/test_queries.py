@@ -0,0 +1,105 @@
+"""Queries run against a real Postgres.
+
+Set TEST_DATABASE_URL to a disposable database (it is migrated and its
+tables are emptied); without it these tests are skipped.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import pytest
+
+from db import queries
+from db.cache import auth_cache, profile_cache
+from db.migrations import migrate
+from services.cooldown import CooldownTracker
+
+DSN = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DSN, reason="TEST_DATABASE_URL not set")
+
+
+def _run(test):
+    """Run ``test()`` with the queries module on a freshly emptied database."""
+    async def run():
+        pool = await asyncpg.create_pool(DSN, min_size=1, max_size=2)
+        try:
+            await migrate(pool)
+            await pool.execute("TRUNCATE users, subscription_reminders, group_last_ads CASCADE")
+            auth_cache.clear()
+            profile_cache.clear()
+            await queries.set_pool(pool)
+            await test()
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+
+async def _client(telegram_id: int, until: datetime, phone: str = ""):
+    await queries.create_user(telegram_id, phone, None, None, None, f"Client {telegram_id}", None, False)
+    await queries.extend_subscription(telegram_id, until)
+
+
+def test_expiring_subscriptions_windows():
+    now = datetime.now(timezone.utc)
+
+    async def test():
+        await _client(1, now - timedelta(minutes=10))   # just expired
+        await _client(2, now + timedelta(hours=12))     # within 1 day
+        await _client(3, now + timedelta(days=2))       # within 3 days
+        await _client(4, now + timedelta(days=10))      # not yet
+        await _client(5, now - timedelta(days=1))       # expired long ago
+
+        rows = await queries.get_expiring_subscriptions(
+            now, ["1d", "3d", "expired"], [86_400.0, 3 * 86_400.0, 0.0], 3600.0
+        )
+        assert {r.telegram_id: r.kind for r in rows} == {1: "expired", 2: "1d", 3: "3d"}
+        assert not any(r.reminded for r in rows)
+
+    _run(test)
+
+
+def test_reminder_claimed_once():
+    until = datetime.now(timezone.utc) + timedelta(hours=12)
+
+    async def test():
+        await _client(1, until)
+        await _client(2, until)
+        first = await queries.claim_reminders([(1, until, "1d")])
+        second = await queries.claim_reminders([(1, until, "1d"), (2, until, "1d")])
+        assert first == {(1, "1d")}
+        assert second == {(2, "1d")}
+
+    _run(test)
+
+
+def test_search_users_by_phone():
+    until = datetime.now(timezone.utc) + timedelta(days=30)
+
+    async def test():
+        await _client(1, until, phone="998900000005")
+        await _client(2, until, phone="+998901112233")
+        found = await queries.search_users("+998 90 000 00 05", limit=10)
+        assert [u.telegram_id for u in found] == [1]
+        found = await queries.search_users("90 111-22-33", limit=10)
+        assert [u.telegram_id for u in found] == [2]
+
+    _run(test)
+
+
+def test_cooldown_shared_between_workers():
+    now = datetime.now(timezone.utc)
+
+    async def test():
+        await _client(1, now + timedelta(days=30))
+        first, second = CooldownTracker(flush_interval=30), CooldownTracker(flush_interval=30)
+        await second.load()
+        first.mark(-100, 1, now)
+        await first.flush()
+        assert second.next_allowed(-100, 1, now) is None
+        await second.load()
+        assert second.next_allowed(-100, 1, now) is not None
+
+    _run(test)